@@ -39,7 +39,19 @@ def create_app(config_class=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI")
     # Disable SQLAlchemy connection pooling to avoid Python 3.13 threading lock bug
     # ("cannot notify on un-acquired lock") in the pool queue implementation.
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"poolclass": NullPool}
+    # SQLALCHEMY_POOL_SIZE réactive un QueuePool (connexions réutilisées,
+    # vérifiées avant usage et recyclées) là où ce bug ne se produit pas.
+    pool_size = os.getenv("SQLALCHEMY_POOL_SIZE")
+    if pool_size:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": int(pool_size),
+            "max_overflow": int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", 30)),
+            "pool_pre_ping": True,
+            "pool_recycle": int(os.getenv("SQLALCHEMY_POOL_RECYCLE", 1800)),
+            "pool_use_lifo": True,
+        }
+    else:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"poolclass": NullPool}
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     app.config["WTF_CSRF_ENABLED"] = os.getenv("WTF_CSRF_ENABLED", "true").lower() in (
@@ -92,6 +104,24 @@ def create_app(config_class=None):
     )
     study_buddy_ai.init_app(app)
 
+    # Relations non chargées explicitement : erreur au lieu d'un lazy load
+    # (requêtes de visioconférence, voir videoconference._eager)
+    app.config["DEBUG_SQLALCHEMY_RAISELOAD"] = os.getenv(
+        "DEBUG_SQLALCHEMY_RAISELOAD", "false"
+    ).lower() in ("true", "1", "t")
+
+    # Détection des chargements paresseux (N+1) en développement uniquement :
+    # NPLUSONE_ENABLED=true lève une exception à chaque lazy load suspect.
+    if os.getenv("NPLUSONE_ENABLED", "false").lower() in ("true", "1", "t"):
+        try:
+            from nplusone.ext.flask_sqlalchemy import NPlusOne
+
+            app.config["NPLUSONE_RAISE"] = True
+            NPlusOne(app)
+            logger.info("nplusone activé : les chargements N+1 lèvent une erreur")
+        except ImportError:
+            logger.warning("NPLUSONE_ENABLED défini mais nplusone n'est pas installé")
+
     # Initialize models
     from app.models import init_models
 
@@ -0,0 +1,31 @@
+"""Add unique constraint on room_participants (room_id, user_id)
+
+Revision ID: 0a6d3f8b5c92
+Revises: f2b7c4a9e1d6
+Create Date: 2026-10-16 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6d3f8b5c92'
+down_revision = 'f2b7c4a9e1d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Supprimer les doublons éventuels (on garde la première participation)
+    op.execute(
+        "DELETE FROM room_participants WHERE id NOT IN "
+        "(SELECT MIN(id) FROM room_participants GROUP BY room_id, user_id)"
+    )
+    with op.batch_alter_table('room_participants', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_room_participant_user', ['room_id', 'user_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('room_participants', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_room_participant_user', type_='unique')
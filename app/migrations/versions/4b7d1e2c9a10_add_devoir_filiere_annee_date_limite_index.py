@@ -0,0 +1,26 @@
+"""Add composite index on devoir (filiere, annee, date_limite)
+
+Revision ID: 4b7d1e2c9a10
+Revises: 2e2676a121b5
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7d1e2c9a10'
+down_revision = '2e2676a121b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('devoir', schema=None) as batch_op:
+        batch_op.create_index('ix_devoir_filiere_annee_date_limite', ['filiere', 'annee', 'date_limite'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('devoir', schema=None) as batch_op:
+        batch_op.drop_index('ix_devoir_filiere_annee_date_limite')
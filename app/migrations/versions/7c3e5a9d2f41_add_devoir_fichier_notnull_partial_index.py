@@ -0,0 +1,26 @@
+"""Add partial index on devoir (enseignant_id) WHERE fichier IS NOT NULL
+
+Revision ID: 7c3e5a9d2f41
+Revises: 4b7d1e2c9a10
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5a9d2f41'
+down_revision = '4b7d1e2c9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('devoir', schema=None) as batch_op:
+        batch_op.create_index('ix_devoir_enseignant_fichier_notnull', ['enseignant_id'], unique=False, postgresql_where=sa.text('fichier IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('devoir', schema=None) as batch_op:
+        batch_op.drop_index('ix_devoir_enseignant_fichier_notnull')
@@ -0,0 +1,26 @@
+"""Add composite index on note (matiere_id, type_evaluation)
+
+Revision ID: a1f4c7e2b8d3
+Revises: 7c3e5a9d2f41
+Create Date: 2026-10-16 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f4c7e2b8d3'
+down_revision = '7c3e5a9d2f41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('note', schema=None) as batch_op:
+        batch_op.create_index('ix_note_matiere_type_evaluation', ['matiere_id', 'type_evaluation'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('note', schema=None) as batch_op:
+        batch_op.drop_index('ix_note_matiere_type_evaluation')
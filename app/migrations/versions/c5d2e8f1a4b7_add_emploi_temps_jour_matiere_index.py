@@ -0,0 +1,26 @@
+"""Add composite index on emploi_temps (jour, matiere_id)
+
+Revision ID: c5d2e8f1a4b7
+Revises: a1f4c7e2b8d3
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8f1a4b7'
+down_revision = 'a1f4c7e2b8d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emploi_temps', schema=None) as batch_op:
+        batch_op.create_index('ix_emploi_temps_jour_matiere', ['jour', 'matiere_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('emploi_temps', schema=None) as batch_op:
+        batch_op.drop_index('ix_emploi_temps_jour_matiere')
@@ -0,0 +1,38 @@
+"""Add composite indexes for teacher dashboard and timetable queries
+
+Revision ID: e8a3b6d9c2f5
+Revises: c5d2e8f1a4b7
+Create Date: 2026-10-16 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a3b6d9c2f5'
+down_revision = 'c5d2e8f1a4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('etudiant', schema=None) as batch_op:
+        batch_op.create_index('ix_etudiant_filiere_annee', ['filiere', 'annee'], unique=False)
+
+    with op.batch_alter_table('emploi_temps', schema=None) as batch_op:
+        batch_op.create_index('ix_emploi_temps_enseignant_matiere_jour', ['enseignant_id', 'matiere_id', 'jour'], unique=False)
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_user_date_created', ['user_id', 'date_created'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_user_date_created')
+
+    with op.batch_alter_table('emploi_temps', schema=None) as batch_op:
+        batch_op.drop_index('ix_emploi_temps_enseignant_matiere_jour')
+
+    with op.batch_alter_table('etudiant', schema=None) as batch_op:
+        batch_op.drop_index('ix_etudiant_filiere_annee')
@@ -0,0 +1,26 @@
+"""Add composite index on rooms (course_id, created_at)
+
+Revision ID: f2b7c4a9e1d6
+Revises: e8a3b6d9c2f5
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7c4a9e1d6'
+down_revision = 'e8a3b6d9c2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('rooms', schema=None) as batch_op:
+        batch_op.create_index('ix_room_course_created_active', ['course_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rooms', schema=None) as batch_op:
+        batch_op.drop_index('ix_room_course_created_active')
@@ -41,5 +41,18 @@ class Devoir(db.Model):
     matiere_id = db.Column(db.Integer, db.ForeignKey("matiere.id"), nullable=True)
     matiere = db.relationship("Matiere", backref="devoirs")
 
+    __table_args__ = (
+        # Couvre les recherches de devoirs à venir par filière/année
+        db.Index(
+            "ix_devoir_filiere_annee_date_limite", "filiere", "annee", "date_limite"
+        ),
+        # Index partiel des devoirs avec fichier (devoirs à corriger)
+        db.Index(
+            "ix_devoir_enseignant_fichier_notnull",
+            "enseignant_id",
+            postgresql_where=db.text("fichier IS NOT NULL"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Devoir id={self.id} titre={self.titre}>"
@@ -15,7 +15,16 @@ Attributes:
     salle (str): Salle où a lieu le cours.
 """
 
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
 from app.extensions import db
+from app.utils.cache import TwoLevelCache
+
+# JSON de l'emploi du temps de chaque enseignant (voir teachers.api_emploi_temps),
+# invalidé au commit de toute modification d'un créneau ou d'une matière
+EMPLOI_TEMPS_CACHE_TTL = 600
+emploi_temps_cache = TwoLevelCache(default_ttl=EMPLOI_TEMPS_CACHE_TTL, max_size=500)
 
 
 class EmploiTemps(db.Model):
@@ -31,6 +40,13 @@ class EmploiTemps(db.Model):
             'salle', 'jour', 'heure_debut', 'heure_fin',
             name='_salle_jour_creneau_uc'
         ),
+        # Cours du jour d'un enseignant (filtre jour + matières de l'enseignant)
+        db.Index('ix_emploi_temps_jour_matiere', 'jour', 'matiere_id'),
+        # Créneau courant d'un enseignant pour une matière (verifier_creneau)
+        db.Index(
+            'ix_emploi_temps_enseignant_matiere_jour',
+            'enseignant_id', 'matiere_id', 'jour'
+        ),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -65,3 +81,62 @@ class EmploiTemps(db.Model):
             'heure_fin': self.heure_fin.strftime('%H:%M') if self.heure_fin else None,
             'salle': self.salle
         }
+
+
+def emploi_temps_cache_key(enseignant_id):
+    """Clé de emploi_temps_cache pour un enseignant."""
+    return f"teacher_emploi_temps:{enseignant_id}"
+
+
+def _invalider_emploi_temps_cache(session):
+    """Supprime du cache les emplois du temps modifiés par la transaction."""
+    for enseignant_id in session.info.pop("emploi_temps_enseignants", ()):
+        emploi_temps_cache.delete(emploi_temps_cache_key(enseignant_id))
+
+
+def _oublier_emploi_temps_modifs(session):
+    """Oublie les modifications annulées par un rollback."""
+    session.info.pop("emploi_temps_enseignants", None)
+
+
+def invalider_emploi_temps_apres_commit(connection, target):
+    """
+    Programme l'invalidation du cache d'emploi du temps des enseignants liés à
+    target (EmploiTemps ou Matiere, ancien enseignant compris) au prochain
+    commit de sa session. Appelé depuis les événements de mapper, avant la
+    mise à jour ou la suppression de la ligne.
+    """
+    session = object_session(target)
+    if session is None:
+        return
+    enseignant_ids = {target.enseignant_id}
+    history = inspect(target).attrs.enseignant_id.history
+    if history.deleted:
+        enseignant_ids.update(history.deleted)
+    elif history.added:
+        # Ancienne valeur expirée (objet modifié après un commit) : relue en base
+        table = type(target).__table__
+        enseignant_ids.add(
+            connection.scalar(
+                select(table.c.enseignant_id).where(table.c.id == target.id)
+            )
+        )
+    enseignant_ids.discard(None)
+    if not enseignant_ids:
+        return
+
+    # Écouteurs posés sur cette session uniquement, une seule fois
+    if not event.contains(session, "after_commit", _invalider_emploi_temps_cache):
+        event.listen(session, "after_commit", _invalider_emploi_temps_cache)
+        event.listen(session, "after_rollback", _oublier_emploi_temps_modifs)
+    session.info.setdefault("emploi_temps_enseignants", set()).update(
+        enseignant_ids
+    )
+
+
+@event.listens_for(EmploiTemps, "after_insert")
+@event.listens_for(EmploiTemps, "before_update")
+@event.listens_for(EmploiTemps, "before_delete")
+def emploi_temps_modifie(mapper, connection, target):
+    """Invalide le cache de l'enseignant dont le créneau a changé"""
+    invalider_emploi_temps_apres_commit(connection, target)
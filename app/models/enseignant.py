@@ -1,3 +1,5 @@
+import json
+
 from app.extensions import db
 
 
@@ -33,3 +35,23 @@ class Enseignant(db.Model):
         if self.user:
             return f"{self.user.prenom} {self.user.nom}"
         return "Enseignant sans utilisateur associé"
+
+    @property
+    def filieres_annees(self):
+        """
+        Retourne le tuple (filieres, annees) décodé depuis le JSON
+        filieres_enseignees. Le décodage est mémorisé sur l'instance tant que
+        la colonne ne change pas.
+        """
+        raw = self.filieres_enseignees
+        cached = self.__dict__.get("_filieres_annees")
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+
+        try:
+            data = json.loads(raw) if raw else {}
+            value = (data.get("filieres", []), data.get("annees", []))
+        except Exception:
+            value = ([], [])
+        self._filieres_annees = (raw, value)
+        return value
@@ -5,6 +5,10 @@ class Etudiant(db.Model):
     """Modèle pour les étudiants"""
 
     __tablename__ = "etudiant"
+    __table_args__ = (
+        # Étudiants d'une filière/année (tableau de bord, notes, présences)
+        db.Index("ix_etudiant_filiere_annee", "filiere", "annee"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     # Ensure the foreign key points to the current users table (plural) which the
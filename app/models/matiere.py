@@ -1,4 +1,7 @@
+from sqlalchemy import event
+
 from app.extensions import db
+from app.models.emploi_temps import invalider_emploi_temps_apres_commit
 
 
 class Matiere(db.Model):
@@ -22,3 +25,10 @@ class Matiere(db.Model):
 
     def __repr__(self):
         return f"<Matiere {self.nom}>"
+
+
+@event.listens_for(Matiere, "before_update")
+@event.listens_for(Matiere, "before_delete")
+def matiere_modifiee(mapper, connection, target):
+    """Le nom et l'enseignant d'une matière figurent dans l'emploi du temps"""
+    invalider_emploi_temps_apres_commit(connection, target)
@@ -29,5 +29,10 @@ class Note(db.Model):
     etudiant = db.relationship("Etudiant", backref="notes")
     matiere = db.relationship("Matiere", backref="notes")
 
+    __table_args__ = (
+        # Couvre le chargement des notes par matière (page notes enseignant)
+        db.Index("ix_note_matiere_type_evaluation", "matiere_id", "type_evaluation"),
+    )
+
     def __repr__(self):
         return f"<Note id={self.id} etudiant_id={self.etudiant_id} note={self.note}>"
@@ -6,6 +6,10 @@ class Notification(db.Model):
     """Modèle pour les notifications utilisateur"""
 
     __tablename__ = "notification"
+    __table_args__ = (
+        # Dernières notifications d'un utilisateur (ORDER BY date_created DESC)
+        db.Index("ix_notification_user_date_created", "user_id", "date_created"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     titre = db.Column(db.String(200), nullable=False)
@@ -72,8 +76,14 @@ class Notification(db.Model):
         element_id=None,
         element_type=None,
         link=None,
+        commit=True,
     ):
-        """Crée une nouvelle notification et l'envoie en temps réel via Socket.IO"""
+        """
+        Crée une nouvelle notification et l'envoie en temps réel via Socket.IO.
+
+        Avec commit=False, la notification est seulement ajoutée (flush) à la
+        transaction en cours : l'appelant se charge du commit.
+        """
         notification = cls(
             user_id=user_id,
             titre=titre,
@@ -84,7 +94,10 @@ class Notification(db.Model):
             lien=link,
         )
         db.session.add(notification)
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
 
         # Envoi en temps réel si possible
         try:
@@ -106,3 +119,63 @@ class Notification(db.Model):
             print(f"[NOTIF ERROR] Error emitting via socket: {e}")
 
         return notification
+
+    @classmethod
+    def creer_notifications(
+        cls,
+        user_ids,
+        titre,
+        message,
+        type=None,
+        element_id=None,
+        element_type=None,
+        link=None,
+        commit=True,
+    ):
+        """
+        Crée la même notification pour plusieurs utilisateurs en un seul INSERT
+        multi-lignes, puis l'envoie en temps réel via Socket.IO à chacun.
+
+        Avec commit=False, l'INSERT fait partie de la transaction en cours et
+        l'appelant se charge du commit.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+
+        date_created = datetime.now(tz=timezone.utc)
+        db.session.bulk_insert_mappings(
+            cls,
+            [
+                {
+                    "user_id": user_id,
+                    "titre": titre,
+                    "message": message,
+                    "type": type,
+                    "element_id": element_id,
+                    "element_type": element_type,
+                    "lien": link,
+                    "date_created": date_created,
+                    "is_read": False,
+                }
+                for user_id in user_ids
+            ],
+        )
+        if commit:
+            db.session.commit()
+
+        # Envoi en temps réel si possible
+        try:
+            from app.extensions import socketio
+
+            payload = {
+                "titre": titre,
+                "message": message,
+                "type": type or "info",
+                "date": date_created.isoformat(),
+            }
+            for user_id in user_ids:
+                socketio.emit("new_notification", payload, room=f"user_{user_id}")
+        except Exception as e:
+            # Ne pas bloquer la création si le socket échoue
+            print(f"[NOTIF ERROR] Error emitting via socket: {e}")
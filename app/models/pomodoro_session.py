@@ -159,6 +159,66 @@ class PomodoroSession(db.Model):
 
         return stats
 
+    @staticmethod
+    def get_stats_periodes(etudiant_id):
+        """
+        Récupère en une seule requête les statistiques du jour, de la semaine
+        et du mois (agrégats conditionnels sur la fenêtre la plus large)
+
+        Args:
+            etudiant_id: ID de l'étudiant
+
+        Returns:
+            dict: {"today": ..., "week": ..., "month": ...}, chaque période
+            contenant sessions_completed, total_minutes et breaks_taken
+        """
+        from datetime import timedelta
+        from sqlalchemy import and_, case, func
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        debuts = {
+            "today": today,
+            "week": today - timedelta(days=today.weekday()),
+            "month": today.replace(day=1),
+        }
+
+        colonnes = []
+        for debut in debuts.values():
+            dans_periode = PomodoroSession.date_debut >= debut
+            pause_dans_periode = and_(
+                dans_periode, PomodoroSession.pause_prise.is_(True)
+            )
+            colonnes.extend(
+                [
+                    func.sum(case((dans_periode, 1), else_=0)),
+                    func.sum(
+                        case((dans_periode, PomodoroSession.duree_reelle), else_=0)
+                    ),
+                    func.sum(case((pause_dans_periode, 1), else_=0)),
+                ]
+            )
+
+        row = (
+            db.session.query(*colonnes)
+            .filter(
+                PomodoroSession.etudiant_id == etudiant_id,
+                PomodoroSession.date_debut >= min(debuts.values()),
+                PomodoroSession.type_session == "travail",
+                PomodoroSession.statut == "terminee",
+            )
+            .one()
+        )
+
+        stats = {}
+        for i, periode in enumerate(debuts):
+            sessions, minutes, pauses = row[3 * i : 3 * i + 3]
+            stats[periode] = {
+                "sessions_completed": int(sessions or 0),
+                "total_minutes": int(minutes or 0),
+                "breaks_taken": int(pauses or 0),
+            }
+        return stats
+
     @staticmethod
     def get_stats_par_matiere(etudiant_id, days=7):
         """
@@ -28,6 +28,10 @@ class Room(db.Model):
     """
 
     __tablename__ = "rooms"
+    __table_args__ = (
+        # Salle du jour d'un cours (filtre course_id + intervalle sur created_at)
+        db.Index("ix_room_course_created_active", "course_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -80,6 +84,10 @@ class RoomParticipant(db.Model):
     """
 
     __tablename__ = "room_participants"
+    __table_args__ = (
+        # Un utilisateur n'est inscrit qu'une fois par salle (cible de l'upsert)
+        db.UniqueConstraint("room_id", "user_id", name="uq_room_participant_user"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(
@@ -1,4 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    redirect,
+    url_for,
+    flash,
+    session,
+)
 from flask_login import login_user, login_required, logout_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime, date, timedelta, UTC
@@ -39,6 +47,15 @@ def login():
                 print("✅ Mot de passe correct")
                 if user.statut == "approuve":
                     login_user(user)
+                    # Profil enseignant résolu une fois pour toute la session
+                    # (voir teachers.current_enseignant)
+                    session.pop("enseignant_id", None)
+                    if user.role == "enseignant":
+                        session["enseignant_id"] = (
+                            Enseignant.query.with_entities(Enseignant.id)
+                            .filter_by(user_id=user.id)
+                            .scalar()
+                        )
                     flash("Connexion réussie.", "success")
                     print("✅ Connexion réussie")
 
@@ -213,6 +230,7 @@ def logout():
     Déconnecte l'utilisateur actuel et redirige vers la page de connexion.
     """
     logout_user()
+    session.pop("enseignant_id", None)
     flash("Vous avez été déconnecté.", "info")
     return redirect(url_for("auth.login"))
 
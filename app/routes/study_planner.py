@@ -4,15 +4,33 @@ Smart scheduling and personalized study recommendations
 Version améliorée avec parsing JSON robuste
 """
 
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    jsonify,
+    flash,
+    redirect,
+    url_for,
+    g,
+)
 from flask_login import login_required, current_user
-from datetime import datetime, timedelta
-from sqlalchemy import func
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import load_only
+from collections import defaultdict
+from functools import lru_cache, wraps
+from operator import itemgetter
+import copy
+import hashlib
 import requests
 import json
 import re
 import os
+import uuid
+import numpy as np
 from app.extensions import db
 from app.models.etudiant import Etudiant
 from app.models.note import Note
@@ -21,18 +39,78 @@ from app.models.devoir_vu import DevoirVu
 from app.models.matiere import Matiere
 from app.models.presence import Presence
 from app.models.pomodoro_session import PomodoroSession
+from app.utils.cache import QueryCache, TwoLevelCache, make_cache_key
 from flask import current_app
 
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # Configuration API Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = (
-    "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key="
-    + GEMINI_API_KEY
-)
+# La clé est passée en paramètre de requête à l'appel : le module reste
+# importable sans GEMINI_API_KEY (call_gemini_api signale alors l'erreur)
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
 
 
 study_planner_bp = Blueprint("study_planner", __name__, url_prefix="/study-planner")
 
+# Cache des plans générés par Gemini (clé = hash des données d'entrée)
+PLAN_CACHE_TTL = 3600
+plan_cache = QueryCache(default_ttl=PLAN_CACHE_TTL, max_size=500)
+
+# Cache des réponses brutes de Gemini (clé = md5 du prompt et de la température)
+gemini_cache = QueryCache(default_ttl=3600, max_size=500)
+
+# Plans affichés par /view-plan, stockés côté serveur et référencés par un id
+PLAN_VIEW_TTL = 86400
+plan_view_cache = TwoLevelCache(default_ttl=PLAN_VIEW_TTL, max_size=500)
+
+# Recommandations par étudiant, réutilisées tant que son profil ne change pas
+RECO_CACHE_TTL = 86400
+reco_cache = TwoLevelCache(default_ttl=RECO_CACHE_TTL, max_size=1000)
+
+# Nombre de matières à partir duquel le calcul des priorités passe par NumPy
+NUMPY_PRIORITY_THRESHOLD = 50
+
+# Nombre de sessions à partir duquel les totaux journaliers passent par NumPy
+NUMPY_PLAN_THRESHOLD = 20
+
+# Balises Markdown ```json / ``` entourant parfois les réponses de Gemini
+_JSON_FENCE_RE = re.compile(r"```(?:json)?")
+
+# Noms des jours indexés par datetime.weekday() (0 = lundi)
+JOURS_FR = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+_JOURS_FR_LOWER = tuple(jour.lower() for jour in JOURS_FR)
+
+# Champs communs des sessions (StudySession) générées par build_day_sessions
+SESSION_DEVOIR = {"type": "devoir", "matiere": "Devoir", "priorite": "haute"}
+SESSION_REVISION = {"type": "revision", "priorite": "moyenne"}
+SESSION_FOCUS = {
+    "type": "focus",
+    "priorite": "normale",
+    "description": "Session d'approfondissement",
+}
+SESSION_REVISION_GENERALE = {
+    "type": "revision_generale",
+    "titre": "Révision générale",
+    "matiere": "Toutes matières",
+    "priorite": "basse",
+    "description": "Révision des points importants",
+}
+
+# Bornes de la journée prises en compte par find_free_slots, en minutes
+DAY_START = 7 * 60
+DAY_END = 23 * 60
+
+# Nombre maximal d'éléments injectés dans les prompts Gemini
+PROMPT_MAX_MATIERES = 10
+PROMPT_MAX_DEVOIRS = 15
+
 
 def student_required(f):
     """Décorateur pour restreindre l'accès aux étudiants"""
@@ -50,6 +128,51 @@ def student_required(f):
     return decorated_function
 
 
+def current_etudiant():
+    """
+    Retourne le profil Etudiant de l'utilisateur connecté (ou None).
+    Le résultat est mémorisé dans g pour la durée de la requête.
+    """
+    if "_etudiant" not in g:
+        g._etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+    return g._etudiant
+
+
+def request_now():
+    """
+    Retourne l'horodatage de la requête courante, calculé une seule fois.
+    Toutes les comparaisons de dates d'une même requête utilisent ainsi la
+    même référence (g.now).
+    """
+    if "now" not in g:
+        g.now = datetime.now()
+    return g.now
+
+
+def _json_loads(text):
+    """
+    Parse une chaîne JSON avec orjson si disponible, sinon avec json (stdlib).
+    En cas d'échec d'orjson, json prend le relais pour conserver ses messages
+    d'erreur (et sa tolérance à NaN/Infinity) dans la logique de réparation.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def _json_dumps(data):
+    """
+    Sérialise en JSON (UTF-8, sans échappement ASCII) avec orjson si disponible,
+    sinon avec json (stdlib).
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+
 def clean_json_response(text):
     """
     Nettoie la réponse de Gemini pour extraire le JSON valide
@@ -74,7 +197,7 @@ def clean_json_response(text):
     if start != -1 and end != -1 and end > start:
         json_text = text[start : end + 1]
         try:
-            parsed = json.loads(json_text)
+            parsed = _json_loads(json_text)
             return parsed
         except json.JSONDecodeError as e:
             current_app.logger.error(f"Erreur parsing JSON: {e}")  # Debug
@@ -93,15 +216,14 @@ def clean_json_response(text):
             open_brackets = json_text_fixed.count("[")
             close_brackets = json_text_fixed.count("]")
 
-            # Ajouter les accolades manquantes
-            while close_braces < open_braces:
-                json_text_fixed += "}"
-                close_braces += 1
-
-            # Ajouter les crochets manquants
-            while close_brackets < open_brackets:
-                json_text_fixed += "]"
-                close_brackets += 1
+            # Ajouter les accolades et crochets manquants en une seule concaténation
+            json_text_fixed = "".join(
+                (
+                    json_text_fixed,
+                    "}" * (open_braces - close_braces),
+                    "]" * (open_brackets - close_brackets),
+                )
+            )
 
             # Corriger les virgules en trop
             json_text_fixed = json_text_fixed.replace(",}", "}")
@@ -120,12 +242,13 @@ def clean_json_response(text):
                 close_braces = json_text_fixed.count("}")
                 open_brackets = json_text_fixed.count("[")
                 close_brackets = json_text_fixed.count("]")
-                while close_braces < open_braces:
-                    json_text_fixed += "}"
-                    close_braces += 1
-                while close_brackets < open_brackets:
-                    json_text_fixed += "]"
-                    close_brackets += 1
+                json_text_fixed = "".join(
+                    (
+                        json_text_fixed,
+                        "}" * (open_braces - close_braces),
+                        "]" * (open_brackets - close_brackets),
+                    )
+                )
 
             # Tenter de parser le JSON corrigé
             try:
@@ -165,12 +288,13 @@ def clean_json_response(text):
                         open_brackets = reconstructed.count("[")
                         close_brackets = reconstructed.count("]")
 
-                        while close_braces < open_braces:
-                            reconstructed += "}"
-                            close_braces += 1
-                        while close_brackets < open_brackets:
-                            reconstructed += "]"
-                            close_brackets += 1
+                        reconstructed = "".join(
+                            (
+                                reconstructed,
+                                "}" * (open_braces - close_braces),
+                                "]" * (open_brackets - close_brackets),
+                            )
+                        )
 
                         # Corriger les virgules finales
                         reconstructed = reconstructed.replace(",}", "}")
@@ -201,6 +325,38 @@ def clean_json_response(text):
     return None
 
 
+def cache_gemini_response(func):
+    """
+    Met en cache les réponses Gemini réussies, indexées par md5(prompt + température).
+
+    Les profils (moyennes, absences, devoirs) évoluent lentement : un même prompt
+    dans l'heure renvoie la réponse déjà obtenue sans nouvel appel réseau.
+
+    Les plans et recommandations ont leur propre cache (plan_cache, reco_cache),
+    dont la clé détermine le prompt : ils appellent avec use_cache=False pour ne
+    pas stocker deux fois la même réponse. Le cache conserve et renvoie des
+    copies, qu'un appelant peut donc modifier sans l'altérer.
+    """
+
+    @wraps(func)
+    def wrapper(prompt, temperature=0.7, use_cache=True):
+        if not use_cache:
+            return func(prompt, temperature=temperature)
+
+        key = hashlib.md5(f"{prompt}{temperature}".encode("utf-8")).hexdigest()
+        cached = gemini_cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        result = func(prompt, temperature=temperature)
+        if result.get("success"):
+            gemini_cache.set(key, copy.deepcopy(result))
+        return result
+
+    return wrapper
+
+
+@cache_gemini_response
 def call_gemini_api(prompt, temperature=0.7):
     """
     Appelle l'API Gemini avec un prompt optimisé
@@ -228,7 +384,11 @@ def call_gemini_api(prompt, temperature=0.7):
 
         try:
             response = requests.post(
-                GEMINI_API_URL, headers=headers, json=data, timeout=30
+                GEMINI_API_URL,
+                params={"key": GEMINI_API_KEY},
+                headers=headers,
+                json=data,
+                timeout=30,
             )
             current_app.logger.info(f"Réponse reçue : {response.status_code}")
 
@@ -255,7 +415,7 @@ def call_gemini_api(prompt, temperature=0.7):
                                 text_response = text_response[:-3].strip()
 
                             try:
-                                parsed_json = json.loads(text_response)
+                                parsed_json = _json_loads(text_response)
                                 return {"success": True, "data": parsed_json}
                             except json.JSONDecodeError as e:
                                 current_app.logger.error(
@@ -304,6 +464,40 @@ def call_gemini_api(prompt, temperature=0.7):
         return {"success": False, "error": f"Erreur inattendue: {str(e)}"}
 
 
+def call_gemini_api_concurrently(calls, use_cache=True):
+    """
+    Exécute plusieurs appels Gemini en parallèle.
+
+    Les appels sont des requêtes HTTP bloquantes : les lancer dans un pool de
+    threads (green threads sous le worker eventlet) ramène la latence totale à
+    celle de l'appel le plus lent au lieu de leur somme.
+
+    Paramètres:
+        calls (list): Liste de tuples (prompt, temperature)
+        use_cache (bool, optionnel): Transmis à call_gemini_api
+
+    Retourne:
+        list: Les résultats de call_gemini_api, dans l'ordre des appels
+    """
+    if not calls:
+        return []
+    if len(calls) == 1:
+        prompt, temperature = calls[0]
+        return [call_gemini_api(prompt, temperature=temperature, use_cache=use_cache)]
+
+    app = current_app._get_current_object()
+
+    def _run(prompt, temperature):
+        with app.app_context():
+            return call_gemini_api(
+                prompt, temperature=temperature, use_cache=use_cache
+            )
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(_run, prompt, temp) for prompt, temp in calls]
+        return [future.result() for future in futures]
+
+
 @study_planner_bp.route("/")
 @login_required
 @student_required
@@ -367,7 +561,7 @@ def api_dashboard():
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -388,20 +582,33 @@ def api_dashboard():
             notes = []
             moyenne_generale = 0
 
-        # Devoirs à venir
+        # Devoirs à venir : nombre réel, nombre d'urgents + aperçu des 5 prochains
         try:
-            devoirs_a_venir = (
-                Devoir.query.filter(
-                    Devoir.filiere == etudiant.filiere,
-                    Devoir.annee == etudiant.annee,
-                    Devoir.date_limite > datetime.now(),
+            filtre_a_venir = (
+                Devoir.filiere == etudiant.filiere,
+                Devoir.annee == etudiant.annee,
+                Devoir.date_limite > request_now(),
+            )
+            nb_devoirs_a_venir, nb_devoirs_urgents = (
+                db.session.query(
+                    func.count(Devoir.id),
+                    func.count(
+                        case((Devoir.date_limite < seuil_urgence(), Devoir.id))
+                    ),
                 )
+                .filter(*filtre_a_venir)
+                .one()
+            )
+            devoirs_a_venir = (
+                Devoir.query.filter(*filtre_a_venir)
                 .order_by(Devoir.date_limite)
                 .limit(5)
                 .all()
             )
         except Exception as e:
             print(f"Erreur devoirs à venir: {e}")
+            nb_devoirs_a_venir = 0
+            nb_devoirs_urgents = 0
             devoirs_a_venir = []
 
         # Devoirs non consultés
@@ -414,14 +621,14 @@ def api_dashboard():
                 devoirs_non_vus = Devoir.query.filter(
                     Devoir.filiere == etudiant.filiere,
                     Devoir.annee == etudiant.annee,
-                    Devoir.date_limite > datetime.now(),
+                    Devoir.date_limite > request_now(),
                     ~Devoir.id.in_(devoirs_vus_ids),
                 ).count()
             else:
                 devoirs_non_vus = Devoir.query.filter(
                     Devoir.filiere == etudiant.filiere,
                     Devoir.annee == etudiant.annee,
-                    Devoir.date_limite > datetime.now(),
+                    Devoir.date_limite > request_now(),
                 ).count()
         except Exception as e:
             print(f"Erreur devoirs non vus: {e}")
@@ -450,7 +657,7 @@ def api_dashboard():
         # Temps d'étude recommandé
         try:
             temps_etude_recommande = calculate_study_time(
-                devoirs_a_venir, matieres_faibles, moyenne_generale
+                nb_devoirs_urgents, matieres_faibles, moyenne_generale
             )
         except Exception as e:
             print(f"Erreur temps étude: {e}")
@@ -469,9 +676,9 @@ def api_dashboard():
                 "nombre_notes": len(notes),
             },
             "devoirs": {
-                "a_venir": len(devoirs_a_venir),
+                "a_venir": nb_devoirs_a_venir,
                 "non_vus": devoirs_non_vus,
-                "urgents": len([d for d in devoirs_a_venir if is_urgent(d)]),
+                "urgents": nb_devoirs_urgents,
             },
             "matieres_faibles": matieres_faibles,
             "temps_etude_recommande": temps_etude_recommande,
@@ -482,7 +689,7 @@ def api_dashboard():
                     "type": d.type,
                     "date_rendu": d.date_limite.isoformat() if d.date_limite else None,
                     "jours_restants": (
-                        (d.date_limite - datetime.now()).days if d.date_limite else 0
+                        (d.date_limite - request_now()).days if d.date_limite else 0
                     ),
                     "urgent": is_urgent(d),
                 }
@@ -528,7 +735,7 @@ def api_generate_smart_plan():
         data = request.get_json()
         days = data.get("days", 7)
 
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -589,7 +796,7 @@ def api_recommendations():
         JSON: Données des recommandations
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -616,6 +823,87 @@ def api_recommendations():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@study_planner_bp.route("/api/student-insights")
+@login_required
+@student_required
+def api_student_insights():
+    """
+    Renvoie en une seule requête l'analyse des matières faibles, les
+    recommandations IA et le plan d'étude intelligent de l'étudiant connecté.
+
+    Les deux prompts Gemini sont indépendants : ils sont envoyés en parallèle,
+    la latence totale est donc celle de l'appel le plus lent.
+
+    Paramètres (query string):
+        days (int, optionnel): Nombre de jours du plan (7 par défaut)
+
+    Retourne:
+        JSON: {"success": bool, "data": {"matieres_faibles": list,
+        "recommendations": list, "plan": dict | None}, "errors": dict}
+    """
+    try:
+        days = request.args.get("days", 7, type=int)
+
+        etudiant = current_etudiant()
+        if not etudiant:
+            return (
+                jsonify({"success": False, "error": "Profil étudiant introuvable"}),
+                404,
+            )
+
+        matieres_faibles = analyze_weak_subjects(etudiant.id)
+        profile_hash, reco_prompt = build_recommendations_prompt(etudiant)
+        plan_key, plan_prompt = build_smart_study_plan_prompt(etudiant, days)
+
+        # Seuls les éléments absents du cache partent vers Gemini
+        cached_reco = get_cached_recommendations(etudiant.id, profile_hash)
+        cached_plan = plan_cache.get(plan_key)
+        calls = []
+        if cached_reco is None:
+            calls.append((reco_prompt, 0.7))
+        if cached_plan is None:
+            calls.append((plan_prompt, 0.8))
+
+        # Déjà couverts par reco_cache et plan_cache
+        results = iter(call_gemini_api_concurrently(calls, use_cache=False))
+
+        if cached_reco is not None:
+            reco_result = {"success": True, "data": cached_reco}
+        else:
+            reco_result = parse_recommendations_result(next(results))
+            if reco_result["success"]:
+                store_recommendations(etudiant.id, profile_hash, reco_result["data"])
+
+        if cached_plan is not None:
+            plan_result = {"success": True, "data": cached_plan}
+        else:
+            plan_result = parse_smart_study_plan_result(next(results), plan_key)
+
+        errors = {
+            name: res.get("error")
+            for name, res in (
+                ("recommendations", reco_result),
+                ("plan", plan_result),
+            )
+            if not res.get("success")
+        }
+
+        return jsonify(
+            {
+                "success": not errors,
+                "data": {
+                    "matieres_faibles": matieres_faibles,
+                    "recommendations": reco_result.get("data", []),
+                    "plan": plan_result.get("data"),
+                },
+                "errors": errors,
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ==================== Fonctions IA améliorées ====================
 
 
@@ -636,44 +924,90 @@ def generate_smart_study_plan(etudiant, days=7):
         être généré, la clé "success" est False, et la clé "error" contient un message
         d'erreur détaillé.
     """
+    cache_key, prompt = build_smart_study_plan_prompt(etudiant, days)
+    cached_plan = plan_cache.get(cache_key)
+    if cached_plan is not None:
+        return {"success": True, "data": cached_plan}
 
-    # Préparer les données de l'étudiant
-    notes = Note.query.filter_by(etudiant_id=etudiant.id).all()
-    matieres_data = []
+    result = call_gemini_api(prompt, temperature=0.8, use_cache=False)
+    return parse_smart_study_plan_result(result, cache_key)
 
-    if notes:
-        notes_valides = [n for n in notes if n.note is not None]
-        matieres_notes = {}
-        for note in notes_valides:
-            matiere = Matiere.query.get(note.matiere_id)
-            if matiere:
-                if matiere.nom not in matieres_notes:
-                    matieres_notes[matiere.nom] = []
-                matieres_notes[matiere.nom].append(note.note)
 
-        for matiere_nom, notes_list in matieres_notes.items():
-            matiere_moyenne = sum(notes_list) / len(notes_list)
-            matieres_data.append(
-                {
-                    "matiere": matiere_nom,
-                    "moyenne": round(matiere_moyenne, 2),
-                    "nb_notes": len(notes_list),
-                    "priorite": (
-                        "haute"
-                        if matiere_moyenne < 10
-                        else "moyenne" if matiere_moyenne < 12 else "basse"
-                    ),
-                }
-            )
+def plan_cache_key(filiere, annee, matieres_data, devoirs_urgents, days):
+    """
+    Construit la clé de plan_cache à partir de tout ce qui entre dans le prompt.
+
+    Deux étudiants de même filière et année, avec les mêmes matières et
+    devoirs, obtiennent la même clé et partagent le plan généré.
+
+    Paramètres:
+        filiere (str): La filière de l'étudiant
+        annee (str): L'année d'étude de l'étudiant
+        matieres_data (list): Les matières et moyennes incluses dans le prompt
+        devoirs_urgents (list): Les devoirs inclus dans le prompt
+        days (int): Le nombre de jours couverts par le plan
+
+    Retourne:
+        str: La clé de cache du plan
+    """
+    return make_cache_key(
+        "plan",
+        {
+            "f": filiere,
+            "a": annee,
+            "m": matieres_data,
+            "d": devoirs_urgents,
+            "days": days,
+        },
+    )
+
+
+def build_smart_study_plan_prompt(etudiant, days=7):
+    """
+    Prépare le prompt Gemini du plan d'étude intelligent.
+
+    Paramètres:
+        etudiant (Etudiant): L'étudiant pour lequel générer le plan
+        days (int, optionnel): Le nombre de jours couverts par le plan
+
+    Retourne:
+        tuple: (cache_key, prompt), cache_key identifiant le plan dans plan_cache
+    """
+
+    # Préparer les données de l'étudiant (moyenne et nombre de notes par matière)
+    notes_by_matiere = (
+        db.session.query(
+            Matiere.nom,
+            func.avg(Note.note).label("moyenne"),
+            func.count(Note.id).label("nb_notes"),
+        )
+        .join(Note, Note.matiere_id == Matiere.id)
+        .filter(Note.etudiant_id == etudiant.id, Note.note.isnot(None))
+        .group_by(Matiere.nom)
+        .all()
+    )
+    moyennes = [float(moyenne) for _, moyenne, _ in notes_by_matiere]
+    matieres_data = [
+        {
+            "matiere": matiere_nom,
+            "moyenne": round(moyenne, 2),
+            "nb_notes": nb_notes,
+            "priorite": priorite,
+        }
+        for (matiere_nom, _, nb_notes), moyenne, priorite in zip(
+            notes_by_matiere, moyennes, compute_priorities(moyennes)
+        )
+    ]
 
     # Devoirs urgents
     devoirs_urgents = []
+    now = request_now()
     devoirs = Devoir.query.filter(
         Devoir.filiere == etudiant.filiere,
         Devoir.annee == etudiant.annee,
-        Devoir.date_limite > datetime.now(),
-        Devoir.date_limite < datetime.now() + timedelta(days=days),
-    ).all()
+        Devoir.date_limite > now,
+        Devoir.date_limite < now + timedelta(days=days),
+    ).order_by(Devoir.date_limite).all()
 
     for devoir in devoirs:
         devoirs_urgents.append(
@@ -682,18 +1016,29 @@ def generate_smart_study_plan(etudiant, days=7):
                 "type": devoir.type,
                 "matiere": devoir.matiere.nom if devoir.matiere else "Générale",
                 "date_limite": devoir.date_limite.strftime("%Y-%m-%d"),
-                "jours_restants": (devoir.date_limite - datetime.now()).days,
+                "jours_restants": (devoir.date_limite - now).days,
             }
         )
 
-    # Prompt optimisé pour Gemini
+    # Limiter la taille du prompt : les matières les plus faibles et les
+    # devoirs les plus proches suffisent à orienter le plan
+    matieres_data = sorted(matieres_data, key=itemgetter("moyenne"))[
+        :PROMPT_MAX_MATIERES
+    ]
+    devoirs_urgents = devoirs_urgents[:PROMPT_MAX_DEVOIRS]
+
+    cache_key = plan_cache_key(
+        etudiant.filiere, etudiant.annee, matieres_data, devoirs_urgents, days
+    )
+
+    # Le prompt ne contient aucune donnée nominative : il ne dépend que des
+    # éléments de la clé de cache, le plan peut donc être partagé
     prompt = f"""Tu es un conseiller pédagogique expert. Génère un plan d'étude détaillé et personnalisé.
 
 DONNÉES DE L'ÉTUDIANT:
-- Nom: {etudiant.user.prenom} {etudiant.user.nom}
 - Filière: {etudiant.filiere} - Année {etudiant.annee}
-- Matières et moyennes: {json.dumps(matieres_data, ensure_ascii=False)}
-- Devoirs urgents: {json.dumps(devoirs_urgents, ensure_ascii=False)}
+- Matières et moyennes: {_json_dumps(matieres_data)}
+- Devoirs urgents: {_json_dumps(devoirs_urgents)}
 
 INSTRUCTIONS:
 Crée un plan d'étude pour {days} jours avec:
@@ -746,14 +1091,26 @@ IMPORTANT: Réponds UNIQUEMENT avec un objet JSON valide, sans texte avant ou ap
   }}
 }}"""
 
-    # Appeler Gemini
-    result = call_gemini_api(prompt, temperature=0.8)
+    return cache_key, prompt
+
+
+def parse_smart_study_plan_result(result, cache_key):
+    """
+    Valide la réponse Gemini d'un plan d'étude et la met en cache si elle est valide.
+
+    Paramètres:
+        result (dict): Le résultat de call_gemini_api
+        cache_key (str): La clé renvoyée par build_smart_study_plan_prompt
 
+    Retourne:
+        dict: {"success": True, "data": plan} ou {"success": False, "error": str}
+    """
     if result.get("success"):
         plan_data = result["data"]
 
         # Valider que les champs essentiels sont présents
         if "plan" in plan_data and isinstance(plan_data["plan"], list):
+            plan_cache.set(cache_key, plan_data)
             return {"success": True, "data": plan_data}
 
     return {
@@ -781,50 +1138,108 @@ def generate_recommendations(etudiant):
             recommandations n'ont pas été générées, la clé "error" contient un message
             d'erreur détaillé.
     """
+    profile_hash, prompt = build_recommendations_prompt(etudiant)
+    cached = get_cached_recommendations(etudiant.id, profile_hash)
+    if cached is not None:
+        return {"success": True, "data": cached}
 
-    # Analyser les notes
-    notes = Note.query.filter_by(etudiant_id=etudiant.id).all()
-    moyenne = 0
-    notes_data = []
+    result = parse_recommendations_result(
+        call_gemini_api(prompt, temperature=0.7, use_cache=False)
+    )
+    if result["success"]:
+        store_recommendations(etudiant.id, profile_hash, result["data"])
+    return result
 
-    if notes:
-        notes_valides = [n for n in notes if n.note is not None]
-        if notes_valides:
-            moyenne = sum(n.note for n in notes_valides) / len(notes_valides)
 
-        matieres_notes = {}
-        for note in notes_valides:
-            matiere = Matiere.query.get(note.matiere_id)
-            if matiere:
-                if matiere.nom not in matieres_notes:
-                    matieres_notes[matiere.nom] = []
-                matieres_notes[matiere.nom].append(note.note)
+def get_cached_recommendations(etudiant_id, profile_hash):
+    """
+    Retourne les recommandations déjà générées pour l'étudiant si son profil
+    (empreinte profile_hash) n'a pas changé depuis, None sinon.
+    """
+    cached = reco_cache.get(f"profile:{etudiant_id}:reco")
+    if cached and cached.get("hash") == profile_hash:
+        return cached["data"]
+    return None
+
+
+def store_recommendations(etudiant_id, profile_hash, recommendations):
+    """Mémorise les recommandations de l'étudiant avec l'empreinte de son profil."""
+    reco_cache.set(
+        f"profile:{etudiant_id}:reco",
+        {"hash": profile_hash, "data": recommendations},
+    )
 
-        for matiere_nom, notes_list in matieres_notes.items():
-            matiere_moyenne = sum(notes_list) / len(notes_list)
-            notes_data.append(
-                {
-                    "matiere": matiere_nom,
-                    "moyenne": round(matiere_moyenne, 2),
-                    "nb_notes": len(notes_list),
-                }
-            )
 
-    # Analyser les présences
-    presences = Presence.query.filter_by(etudiant_id=etudiant.id).all()
-    taux_absence = 0
-    if presences:
-        absences = sum(1 for p in presences if not p.present)
-        taux_absence = (absences / len(presences) * 100) if presences else 0
+def build_recommendations_prompt(etudiant):
+    """
+    Prépare le prompt Gemini des recommandations à partir du profil de l'étudiant
+    (moyennes, taux d'absence, devoirs en retard).
+
+    Args:
+        etudiant (Etudiant): L'étudiant concerné.
+
+    Returns:
+        tuple: (profile_hash, prompt), profile_hash étant l'empreinte des données
+        du profil utilisées dans le prompt.
+    """
 
-    # Analyser les devoirs
-    devoirs_en_retard = (
-        Devoir.query.join(DevoirVu)
+    # Moyenne générale, présences et devoirs en retard : un seul aller-retour
+    # SQL grâce à des sous-requêtes scalaires
+    moyenne_sq = (
+        db.session.query(func.avg(Note.note))
+        .filter(Note.etudiant_id == etudiant.id, Note.note.isnot(None))
+        .scalar_subquery()
+    )
+    total_presences_sq = (
+        db.session.query(func.count(Presence.id))
+        .filter(Presence.etudiant_id == etudiant.id)
+        .scalar_subquery()
+    )
+    absences_sq = (
+        db.session.query(func.count(Presence.id))
+        .filter(
+            Presence.etudiant_id == etudiant.id,
+            or_(Presence.present.is_(False), Presence.present.is_(None)),
+        )
+        .scalar_subquery()
+    )
+    devoirs_en_retard_sq = (
+        db.session.query(func.count(Devoir.id))
+        .join(DevoirVu, DevoirVu.devoir_id == Devoir.id)
         .filter(
-            DevoirVu.etudiant_id == etudiant.id, Devoir.date_limite < datetime.now()
+            DevoirVu.etudiant_id == etudiant.id, Devoir.date_limite < request_now()
         )
-        .count()
+        .scalar_subquery()
     )
+    moyenne, total_presences, absences, devoirs_en_retard = db.session.query(
+        moyenne_sq, total_presences_sq, absences_sq, devoirs_en_retard_sq
+    ).one()
+
+    moyenne = float(moyenne or 0)
+    taux_absence = absences / total_presences * 100 if total_presences else 0
+
+    # Détail par matière
+    notes_by_matiere = (
+        db.session.query(Matiere.nom, func.avg(Note.note), func.count(Note.id))
+        .join(Note, Note.matiere_id == Matiere.id)
+        .filter(Note.etudiant_id == etudiant.id, Note.note.isnot(None))
+        .group_by(Matiere.nom)
+        .all()
+    )
+    notes_data = [
+        {
+            "matiere": matiere_nom,
+            "moyenne": round(float(matiere_moyenne), 2),
+            "nb_notes": nb_notes,
+        }
+        for matiere_nom, matiere_moyenne, nb_notes in notes_by_matiere
+    ]
+    notes_json = _json_dumps(notes_data)
+    profile_hash = hashlib.md5(
+        f"{moyenne:.2f}|{taux_absence:.1f}|{devoirs_en_retard}|{notes_json}".encode(
+            "utf-8"
+        )
+    ).hexdigest()
 
     # Prompt optimisé
     prompt = f"""Tu es un conseiller pédagogique expert. Analyse ce profil étudiant et donne des recommandations concrètes.
@@ -833,7 +1248,7 @@ PROFIL ÉTUDIANT:
 - Moyenne générale: {moyenne:.2f}/20
 - Taux d'absence: {taux_absence:.1f}%
 - Devoirs en retard: {devoirs_en_retard}
-- Détails par matière: {json.dumps(notes_data, ensure_ascii=False)}
+- Détails par matière: {notes_json}
 
 INSTRUCTIONS:
 Donne 4 recommandations personnalisées et actionnables pour améliorer la performance académique.
@@ -863,8 +1278,19 @@ IMPORTANT: Réponds UNIQUEMENT avec un objet JSON valide. Format exact:
   ]
 }}"""
 
-    result = call_gemini_api(prompt, temperature=0.7)
+    return profile_hash, prompt
+
 
+def parse_recommendations_result(result):
+    """
+    Extrait la liste des recommandations d'une réponse Gemini.
+
+    Args:
+        result (dict): Le résultat de call_gemini_api.
+
+    Returns:
+        dict: {"success": True, "data": list} ou {"success": False, "error": str}
+    """
     if result.get("success"):
         reco_data = result["data"]
         if "recommendations" in reco_data and isinstance(
@@ -925,6 +1351,57 @@ def analyze_weak_subjects(etudiant_id):
     return weak_subjects
 
 
+def compute_priorities(moyennes):
+    """
+    Classe chaque moyenne en priorité "haute" (< 10), "moyenne" (< 12) ou "basse".
+
+    Au-delà de NUMPY_PRIORITY_THRESHOLD valeurs, le classement est vectorisé avec
+    NumPy ; en dessous, la boucle Python reste plus rapide.
+
+    Paramètres:
+        moyennes (list): Liste des moyennes par matière.
+
+    Retourne:
+        list: Liste des priorités, dans le même ordre que les moyennes.
+    """
+    if len(moyennes) > NUMPY_PRIORITY_THRESHOLD:
+        avgs = np.fromiter(moyennes, dtype=np.float64, count=len(moyennes))
+        return np.where(
+            avgs < 10, "haute", np.where(avgs < 12, "moyenne", "basse")
+        ).tolist()
+    return ["haute" if m < 10 else "moyenne" if m < 12 else "basse" for m in moyennes]
+
+
+def compute_day_totals(days_sessions):
+    """
+    Calcule la durée totale (en minutes) des sessions de chaque jour.
+
+    Au-delà de NUMPY_PLAN_THRESHOLD sessions, les durées sont mises à plat dans
+    un seul tableau et sommées par jour avec np.bincount.
+
+    Paramètres:
+        days_sessions (list): Liste des listes de sessions, une par jour.
+
+    Retourne:
+        list: Le total de minutes de chaque jour, dans le même ordre.
+    """
+    counts = [len(sessions) for sessions in days_sessions]
+    total_sessions = sum(counts)
+    if total_sessions <= NUMPY_PLAN_THRESHOLD:
+        return [sum(s.get("duree", 0) for s in sessions) for sessions in days_sessions]
+
+    durations = np.fromiter(
+        (s.get("duree", 0) for sessions in days_sessions for s in sessions),
+        dtype=np.int32,
+        count=total_sessions,
+    )
+    # Indice du jour de chaque session ; les jours vides (y compris en début
+    # ou en fin de plan) ressortent à 0 grâce à minlength
+    day_index = np.repeat(np.arange(len(counts)), counts)
+    totals = np.bincount(day_index, weights=durations, minlength=len(counts))
+    return totals.astype(np.int64).tolist()
+
+
 def get_difficulty_level(moyenne):
     """
     Détermine le niveau de difficulté basé sur la moyenne.
@@ -974,7 +1451,7 @@ def calculate_priority(moyenne, nb_notes):
     return min(score_moyenne + score_nb_notes, 100)
 
 
-def calculate_study_time(devoirs, matieres_faibles, moyenne_generale):
+def calculate_study_time(nb_devoirs_urgents, matieres_faibles, moyenne_generale):
     """
     Calcule le temps d'étude recommandé par jour.
 
@@ -986,7 +1463,8 @@ def calculate_study_time(devoirs, matieres_faibles, moyenne_generale):
     par défaut. Il est ensuite ajusté en fonction des critères mentionnés précédemment.
 
     Paramètres:
-        devoirs (list): La liste des devoirs de l'étudiant.
+        nb_devoirs_urgents (int): Le nombre de devoirs urgents de l'étudiant,
+        compté en SQL (voir seuil_urgence).
         matieres_faibles (list): La liste des matières où l'étudiant affiche des difficultés.
         moyenne_generale (float): La moyenne générale de l'étudiant.
 
@@ -1000,13 +1478,22 @@ def calculate_study_time(devoirs, matieres_faibles, moyenne_generale):
     elif moyenne_generale < 12:
         base_time += 30
 
-    devoirs_urgents = sum(1 for d in devoirs if is_urgent(d))
-    base_time += devoirs_urgents * 15
+    base_time += nb_devoirs_urgents * 15
     base_time += len(matieres_faibles) * 20
 
     return min(base_time, 300)
 
 
+def seuil_urgence():
+    """
+    Retourne la date limite en dessous de laquelle un devoir est urgent.
+
+    Même règle que is_urgent ((date_limite - now).days <= 3), exprimée comme une
+    borne utilisable en SQL : date_limite < now + 4 jours.
+    """
+    return request_now() + timedelta(days=4)
+
+
 def is_urgent(devoir):
     """
     Détermine si un devoir est considéré comme urgent en fonction de sa date limite.
@@ -1022,27 +1509,10 @@ def is_urgent(devoir):
         bool: True si la date limite du devoir est inférieure ou égale à trois jours,
         False sinon.
     """
-    jours_restants = (devoir.date_limite - datetime.now()).days
+    jours_restants = (devoir.date_limite - request_now()).days
     return jours_restants <= 3
 
 
-def get_jour_fr(weekday):
-    """
-    Retourne le nom du jour en français.
-
-    Cette fonction prend en paramètre un jour de la semaine (comme un entier) et
-    renvoie le nom correspondant en français.
-
-    Paramètres:
-        weekday (int): Le jour de la semaine (0 pour lundi, 1 pour mardi, etc.).
-
-    Retourne:
-        str: Le nom du jour en français.
-    """
-    jours = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    return jours[weekday]
-
-
 def calculate_most_productive_day(etudiant_id):
     """
     Calcule le jour de la semaine le plus productif.
@@ -1058,30 +1528,29 @@ def calculate_most_productive_day(etudiant_id):
     Retourne:
         str: Le nom du jour le plus productif en français.
     """
-    from datetime import timedelta
-
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    today = request_now().replace(hour=0, minute=0, second=0, microsecond=0)
     start_of_week = today - timedelta(days=today.weekday())
 
-    jours_fr = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-
-    stats_par_jour = {}
-    for i in range(7):
-        day = start_of_week + timedelta(days=i)
-        day_end = day + timedelta(days=1)
-
-        sessions = PomodoroSession.query.filter(
+    # Une seule requête groupée par jour de la semaine (dow : 0 = dimanche)
+    dow = func.extract("dow", PomodoroSession.date_debut)
+    minutes_par_dow = (
+        db.session.query(dow.label("dow"), func.sum(PomodoroSession.duree_reelle))
+        .filter(
             PomodoroSession.etudiant_id == etudiant_id,
-            PomodoroSession.date_debut >= day,
-            PomodoroSession.date_debut < day_end,
+            PomodoroSession.date_debut >= start_of_week,
+            PomodoroSession.date_debut < start_of_week + timedelta(days=7),
             PomodoroSession.statut == "terminee",
             PomodoroSession.type_session == "travail",
-        ).all()
+        )
+        .group_by("dow")
+        .all()
+    )
 
-        total_minutes = sum(s.duree_reelle or 0 for s in sessions)
-        stats_par_jour[jours_fr[i]] = total_minutes
+    stats_par_jour = dict.fromkeys(JOURS_FR, 0)
+    for jour_dow, total_minutes in minutes_par_dow:
+        stats_par_jour[JOURS_FR[(int(jour_dow) + 6) % 7]] = total_minutes or 0
 
-    if stats_par_jour and max(stats_par_jour.values()) > 0:
+    if max(stats_par_jour.values()) > 0:
         return max(stats_par_jour, key=stats_par_jour.get)
     return "Aucun"
 
@@ -1131,20 +1600,21 @@ def api_pomodoro_stats():
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
                 404,
             )
 
-        stats_today = PomodoroSession.get_stats_etudiant(etudiant.id, "today")
-        stats_week = PomodoroSession.get_stats_etudiant(etudiant.id, "week")
-        stats_month = PomodoroSession.get_stats_etudiant(etudiant.id, "month")
+        stats_periodes = PomodoroSession.get_stats_periodes(etudiant.id)
+        stats_today = stats_periodes["today"]
+        stats_week = stats_periodes["week"]
+        stats_month = stats_periodes["month"]
 
         most_productive_day = calculate_most_productive_day(etudiant.id)
 
-        days_in_month = datetime.now().day
+        days_in_month = request_now().day
         average_per_day = (
             stats_month["total_minutes"] / days_in_month if days_in_month > 0 else 0
         )
@@ -1220,7 +1690,7 @@ def api_pomodoro_start():
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -1302,7 +1772,7 @@ def api_pomodoro_complete(session_id):
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -1346,7 +1816,7 @@ def api_pomodoro_interrupt(session_id):
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -1386,7 +1856,7 @@ def api_pomodoro_add_interruption(session_id):
         }
     """
     try:
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
@@ -1448,11 +1918,11 @@ def api_generate_plan():
         # 1. Validation et sécurisation des paramètres d'entrée
         try:
             start_date = datetime.fromisoformat(
-                data.get("start_date", datetime.now().date().isoformat())
+                data.get("start_date", request_now().date().isoformat())
             )
             end_date = datetime.fromisoformat(
                 data.get(
-                    "end_date", (datetime.now() + timedelta(days=7)).date().isoformat()
+                    "end_date", (request_now() + timedelta(days=7)).date().isoformat()
                 )
             )
         except (ValueError, TypeError):
@@ -1468,34 +1938,30 @@ def api_generate_plan():
         focus_areas = data.get("focus_areas", [])
 
         # 2. Récupération des données académiques
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
+        etudiant = current_etudiant()
         if not etudiant:
             return (
                 jsonify({"success": False, "error": "Profil étudiant introuvable"}),
                 404,
             )
 
-        # Récupération des notes pour calcul de moyenne par matière
-        notes = Note.query.filter_by(etudiant_id=etudiant.id).all()
-        matieres_stats = {}
-        for n in notes:
-            if n.matiere_id not in matieres_stats:
-                matieres_stats[n.matiere_id] = {
-                    "sum": 0,
-                    "count": 0,
-                    "nom": n.matiere.nom,
-                }
-            matieres_stats[n.matiere_id]["sum"] += n.note
-            matieres_stats[n.matiere_id]["count"] += 1
-
+        # Moyenne par matière calculée en SQL (une seule requête)
+        moyennes_par_matiere = (
+            db.session.query(Matiere.nom, func.avg(Note.note))
+            .join(Note, Note.matiere_id == Matiere.id)
+            .filter(Note.etudiant_id == etudiant.id, Note.note.isnot(None))
+            .group_by(Matiere.id)
+            .all()
+        )
         matieres_data = [
-            {"matiere": v["nom"], "moyenne": round(v["sum"] / v["count"], 2)}
-            for v in matieres_stats.values()
+            {"matiere": nom, "moyenne": round(float(moyenne), 2)}
+            for nom, moyenne in moyennes_par_matiere
         ]
 
         # Récupération des devoirs à venir sur la période
         devoirs = (
-            Devoir.query.filter(
+            Devoir.query.options(load_only(Devoir.titre, Devoir.date_limite))
+            .filter(
                 Devoir.filiere == etudiant.filiere,
                 Devoir.annee == etudiant.annee,
                 Devoir.date_limite >= start_date,
@@ -1514,7 +1980,7 @@ PROFIL :
 - Période : du {start_date.strftime('%d/%m/%Y')} au {end_date.strftime('%d/%m/%Y')}
 
 PERFORMANCES :
-- Moyennes actuelles : {json.dumps(matieres_data, ensure_ascii=False)}
+- Moyennes actuelles : {_json_dumps(matieres_data)}
 - Priorités déclarées : {', '.join(focus_areas) if focus_areas else 'Aucune'}
 
 ÉCHÉANCES CRITIQUES :
@@ -1551,28 +2017,43 @@ FORMAT JSON ATTENDU :
         # 5. Nettoyage et Parsing de la réponse
         raw_text = result.get("data", {}).get("text", "{}")
         # Supprime les balises Markdown ```json si Gemini les ajoute malgré les instructions
-        clean_json = re.sub(r"```json|```", "", raw_text).strip()
+        clean_json = _JSON_FENCE_RE.sub("", raw_text).strip()
 
         try:
-            plan_data = json.loads(clean_json)
+            plan_data = _json_loads(clean_json)
 
             # Validation sommaire de la structure
             if "plan" not in plan_data:
                 raise ValueError("Clé 'plan' absente de la réponse IA")
 
             # Formatage final pour le front-end
-            formatted_plan = []
-            for day_entry in plan_data["plan"]:
-                sessions = day_entry.get("sessions", [])
-                formatted_day = {
+            days_sessions = [day.get("sessions", []) for day in plan_data["plan"]]
+            day_totals = compute_day_totals(days_sessions)
+            formatted_plan = [
+                {
                     "day": day_entry.get("jour"),
                     "date": day_entry.get("date"),
-                    "total_minutes": sum(s.get("duree", 0) for s in sessions),
+                    "total_minutes": total_minutes,
                     "sessions": sessions,
                 }
-                formatted_plan.append(formatted_day)
+                for day_entry, sessions, total_minutes in zip(
+                    plan_data["plan"], days_sessions, day_totals
+                )
+            ]
 
-            return jsonify({"success": True, "data": {"plan": formatted_plan}})
+            # Le plan reste côté serveur : /view-plan ne reçoit que son id
+            plan_id = uuid.uuid4().hex
+            plan_view_cache.set(
+                f"plan_view:{current_user.id}:{plan_id}", {"plan": formatted_plan}
+            )
+
+            return jsonify(
+                {
+                    "success": True,
+                    "plan_id": plan_id,
+                    "data": {"plan": formatted_plan},
+                }
+            )
 
         except (json.JSONDecodeError, ValueError) as e:
             current_app.logger.error(
@@ -1596,19 +2077,26 @@ def view_plan():
     Affiche le plan d'étude.
 
     Cette fonction est appelée lorsque l'utilisateur accède à l'URL "/view-plan"
-    du planificateur d'études. Elle récupère les données du plan d'étude à afficher
-    à partir de la chaîne de caractères "data" dans les paramètres de la requête.
-    Les données sont décodées à partir de l'URL, puis affichées sous forme d'arbre de
-    répertoires avec les activités de chaque jour.
+    du planificateur d'études. Le plan est retrouvé côté serveur grâce au paramètre
+    "plan_id" renvoyé par /api/generate-plan ; l'ancien paramètre "data" (plan JSON
+    encodé dans l'URL) reste accepté. Le plan est ensuite affiché sous forme d'arbre
+    de répertoires avec les activités de chaque jour.
 
     Retourne:
         Un objet JSON de réponse avec la clé "success" à True si le plan d'étude a
         été affiché avec succès, False sinon. Si le plan d'étude n'a pas été affiché,
         la clé "error" contient un message d'erreur détaillé.
     """
-    import json
     from urllib.parse import unquote
 
+    plan_id = request.args.get("plan_id")
+    if plan_id:
+        plan = plan_view_cache.get(f"plan_view:{current_user.id}:{plan_id}")
+        if plan is None:
+            flash("Ce plan d'étude a expiré, veuillez le régénérer.", "error")
+            return redirect(url_for("study_planner.index"))
+        return render_template("study_planner/view_plan.html", plan=plan)
+
     plan_data = request.args.get("data")
 
     if not plan_data:
@@ -1617,7 +2105,7 @@ def view_plan():
 
     try:
         plan_json = unquote(plan_data)
-        plan = json.loads(plan_json)
+        plan = _json_loads(plan_json)
 
         return render_template("study_planner/view_plan.html", plan=plan)
     except Exception as e:
@@ -1625,6 +2113,51 @@ def view_plan():
         return redirect(url_for("study_planner.index"))
 
 
+@dataclass(slots=True)
+class StudySession:
+    """Session d'étude du plan local."""
+
+    type: str
+    titre: str
+    matiere: str
+    duree: int
+    priorite: str
+    description: str
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "titre": self.titre,
+            "matiere": self.matiere,
+            "duree": self.duree,
+            "priorite": self.priorite,
+            "description": self.description,
+        }
+
+
+@dataclass(slots=True, frozen=True)
+class PauseSession:
+    """Pause Pomodoro insérée entre deux sessions d'étude."""
+
+    duree: int
+    type: str = "pause"
+    titre: str = "Pause"
+    description: str = "Pause recommandée pour optimiser la concentration"
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "titre": self.titre,
+            "duree": self.duree,
+            "description": self.description,
+        }
+
+
+# Pauses insérées par iter_with_breaks (immuables, donc partagées)
+PAUSE_5 = PauseSession(5)
+PAUSE_15 = PauseSession(15)
+
+
 def generate_smart_plan(
     start_date,
     end_date,
@@ -1657,87 +2190,141 @@ def generate_smart_plan(
     current_date = start_date
     study_minutes_per_day = study_hours_per_day * 60
 
-    while current_date <= end_date:
-        day_plan = {
-            "date": current_date.isoformat(),
-            "jour": get_jour_fr(current_date.weekday()),
-            "sessions": [],
-            "total_minutes": 0,
-        }
+    # Le contenu d'une journée ne dépend pas de la date (l'urgence des devoirs
+    # est évaluée par rapport à maintenant) : il est calculé une seule fois
+    day_sessions, day_total_minutes = build_day_sessions(
+        study_minutes_per_day, devoirs, weak_subjects, focus_areas
+    )
+    day_sessions = list(iter_with_breaks(day_sessions))
 
-        remaining_minutes = study_minutes_per_day
-
-        # Devoirs urgents
-        for devoir in devoirs:
-            if is_urgent(devoir) and remaining_minutes > 0:
-                duration = min(60, remaining_minutes)
-                session = {
-                    "type": "devoir",
-                    "titre": f"Travail sur: {devoir.titre}",
-                    "matiere": "Devoir",
-                    "duree": duration,
-                    "priorite": "haute",
-                    "description": f"{devoir.type} à rendre le {devoir.date_limite.strftime('%d/%m/%Y') if devoir.date_limite else 'N/A'}",
-                }
-                day_plan["sessions"].append(session)
-                remaining_minutes -= duration
-
-        # Matières faibles
-        for weak in weak_subjects[:3]:
-            if remaining_minutes > 0:
-                duration = min(45, remaining_minutes)
-                session = {
-                    "type": "revision",
-                    "titre": f"Révision: {weak['matiere']}",
-                    "matiere": weak["matiere"],
-                    "duree": duration,
-                    "priorite": "moyenne",
-                    "description": f"Moyenne actuelle: {weak['moyenne']}/20 - {weak['niveau_difficulte']}",
-                }
-                day_plan["sessions"].append(session)
-                remaining_minutes -= duration
-
-        # Focus areas
-        for focus in focus_areas:
-            if remaining_minutes > 0:
-                duration = min(45, remaining_minutes)
-                session = {
-                    "type": "focus",
-                    "titre": f"Approfondissement: {focus}",
-                    "matiere": focus,
-                    "duree": duration,
-                    "priorite": "normale",
-                    "description": "Session d'approfondissement",
-                }
-                day_plan["sessions"].append(session)
-                remaining_minutes -= duration
-
-        # Révision générale
-        if remaining_minutes > 0:
-            session = {
-                "type": "revision_generale",
-                "titre": "Révision générale",
-                "matiere": "Toutes matières",
-                "duree": remaining_minutes,
-                "priorite": "basse",
-                "description": "Révision des points importants",
+    while current_date <= end_date:
+        plan.append(
+            {
+                "date": current_date.isoformat(),
+                "jour": JOURS_FR[current_date.weekday()],
+                # Dictionnaires propres à chaque jour : modifier une session d'un
+                # jour ne touche pas les autres
+                "sessions": [s.to_dict() for s in day_sessions],
+                "total_minutes": day_total_minutes,
             }
-            day_plan["sessions"].append(session)
-
-        day_plan["total_minutes"] = sum(s["duree"] for s in day_plan["sessions"])
-        day_plan["sessions"] = add_pomodoro_breaks(day_plan["sessions"])
-
-        plan.append(day_plan)
+        )
         current_date += timedelta(days=1)
 
     return {
         "plan": plan,
         "total_days": len(plan),
-        "total_hours": sum(d["total_minutes"] for d in plan) / 60,
-        "recommendations": generate_plan_recommendations_basic(plan, weak_subjects),
+        "total_hours": day_total_minutes * len(plan) / 60,
+        "recommendations": generate_plan_recommendations_basic(
+            plan, weak_subjects, day_total_minutes if plan else 0
+        ),
     }
 
 
+def build_day_sessions(study_minutes_per_day, devoirs, weak_subjects, focus_areas):
+    """
+    Répartit le temps d'étude d'une journée entre les sessions du plan local.
+
+    Les devoirs urgents passent en premier (60 min max chacun), puis les trois
+    matières les plus faibles et les domaines choisis (45 min max), le temps
+    restant étant consacré à une révision générale.
+
+    Paramètres:
+        study_minutes_per_day (int): Le temps d'étude disponible, en minutes
+        devoirs (list): La liste des devoirs à effectuer
+        weak_subjects (list): Les matières faibles (voir analyze_weak_subjects)
+        focus_areas (list): Les domaines sur lesquels l'étudiant veut se concentrer
+
+    Retourne:
+        tuple: (sessions, total_minutes) - la liste des sessions (StudySession)
+        de la journée, sans pauses, et leur durée cumulée en minutes.
+    """
+    remaining_minutes = study_minutes_per_day
+
+    # Devoirs urgents
+    urgents = [devoir for devoir in devoirs if is_urgent(devoir)]
+    durations = _allocate_minutes(remaining_minutes, 60, len(urgents))
+    remaining_minutes -= sum(durations)
+    sessions = [
+        StudySession(
+            **SESSION_DEVOIR,
+            titre=_devoir_title(devoir.titre),
+            duree=duration,
+            description=f"{devoir.type} à rendre le {devoir.date_limite.strftime('%d/%m/%Y') if devoir.date_limite else 'N/A'}",
+        )
+        for devoir, duration in zip(urgents, durations)
+    ]
+
+    # Matières faibles
+    weak_subjects = weak_subjects[:3]
+    durations = _allocate_minutes(remaining_minutes, 45, len(weak_subjects))
+    remaining_minutes -= sum(durations)
+    sessions += [
+        StudySession(
+            **SESSION_REVISION,
+            titre=_revision_title(weak["matiere"]),
+            matiere=weak["matiere"],
+            duree=duration,
+            description=f"Moyenne actuelle: {weak['moyenne']}/20 - {weak['niveau_difficulte']}",
+        )
+        for weak, duration in zip(weak_subjects, durations)
+    ]
+
+    # Focus areas
+    durations = _allocate_minutes(remaining_minutes, 45, len(focus_areas))
+    remaining_minutes -= sum(durations)
+    sessions += [
+        StudySession(
+            **SESSION_FOCUS,
+            titre=_focus_title(focus),
+            matiere=focus,
+            duree=duration,
+        )
+        for focus, duration in zip(focus_areas, durations)
+    ]
+
+    # Révision générale
+    if remaining_minutes > 0:
+        sessions.append(
+            StudySession(**SESSION_REVISION_GENERALE, duree=remaining_minutes)
+        )
+        remaining_minutes = 0
+
+    return sessions, study_minutes_per_day - remaining_minutes
+
+
+@lru_cache(maxsize=256)
+def _devoir_title(titre):
+    return f"Travail sur: {titre}"
+
+
+@lru_cache(maxsize=256)
+def _revision_title(matiere):
+    return f"Révision: {matiere}"
+
+
+@lru_cache(maxsize=256)
+def _focus_title(focus):
+    return f"Approfondissement: {focus}"
+
+
+def _allocate_minutes(budget, max_duree, count):
+    """
+    Découpe un budget de minutes en au plus count sessions de max_duree minutes,
+    la dernière recevant le reliquat.
+
+    Retourne:
+        list: Les durées des sessions qui tiennent dans le budget.
+    """
+    if budget <= 0 or count <= 0:
+        return []
+    full = int(min(count, budget // max_duree))
+    durations = [max_duree] * full
+    reste = budget - full * max_duree
+    if full < count and reste > 0:
+        durations.append(reste)
+    return durations
+
+
 def add_pomodoro_breaks(sessions):
     """
     Ajoute des pauses Pomodoro.
@@ -1748,32 +2335,33 @@ def add_pomodoro_breaks(sessions):
     session précédente.
 
     Paramètres:
-        sessions (list): une liste de sessions d'étude. Chaque session est un
-            dictionnaire contenant les clés "type", "titre", "duree", et
-            "description".
+        sessions (list): une liste de sessions d'étude (StudySession).
 
     Retourne:
         list: une liste de sessions d'étude avec des pauses Pomodoro ajoutées.
     """
-    enhanced_sessions = []
-    for i, session in enumerate(sessions):
-        enhanced_sessions.append(session)
+    return list(iter_with_breaks(sessions))
 
-        if i < len(sessions) - 1:
-            pause_duration = 15 if session["duree"] >= 30 else 5
-            enhanced_sessions.append(
-                {
-                    "type": "pause",
-                    "titre": "Pause",
-                    "duree": pause_duration,
-                    "description": "Pause recommandée pour optimiser la concentration",
-                }
-            )
 
-    return enhanced_sessions
+def iter_with_breaks(sessions):
+    """
+    Produit les sessions et les pauses Pomodoro une à une, sans construire de
+    liste intermédiaire. add_pomodoro_breaks en est la version liste.
 
+    Paramètres:
+        sessions (list): une liste de sessions d'étude (StudySession).
 
-def generate_plan_recommendations_basic(plan, weak_subjects):
+    Retourne:
+        generator: les sessions entrecoupées de pauses Pomodoro.
+    """
+    last = len(sessions) - 1
+    for i, session in enumerate(sessions):
+        yield session
+        if i < last:
+            yield PAUSE_15 if session.duree >= 30 else PAUSE_5
+
+
+def generate_plan_recommendations_basic(plan, weak_subjects, avg_per_day):
     """
     Génère des recommandations basiques (fallback).
 
@@ -1784,6 +2372,8 @@ def generate_plan_recommendations_basic(plan, weak_subjects):
     Paramètres:
         plan (list): un plan d'étude généré par la fonction `generate_smart_study_plan`
         weak_subjects (list): une liste de noms de matières faibles.
+        avg_per_day (float): le temps d'étude moyen par jour du plan, en minutes,
+            déjà connu de l'appelant.
 
     Retourne:
         list: une liste de recommandations basiques. Chaque recommandation est un
@@ -1793,9 +2383,6 @@ def generate_plan_recommendations_basic(plan, weak_subjects):
     """
     recommendations = []
 
-    total_minutes = sum(d["total_minutes"] for d in plan)
-    avg_per_day = total_minutes / len(plan) if plan else 0
-
     if avg_per_day < 120:
         recommendations.append(
             {
@@ -1830,78 +2417,115 @@ def generate_plan_recommendations_basic(plan, weak_subjects):
     return recommendations
 
 
-def find_free_slots(current_date, emploi_temps):
+@dataclass(slots=True, frozen=True)
+class Slot:
+    """Créneau horaire, bornes en minutes depuis minuit."""
+
+    debut: int
+    fin: int
+
+    def to_dict(self) -> dict[str, str]:
+        """Retourne le créneau au format {"debut": "HH:MM", "fin": "HH:MM"}."""
+        return {"debut": _from_min(self.debut), "fin": _from_min(self.fin)}
+
+
+def _to_min(heure: str) -> int:
+    """Convertit une heure "HH:MM" en nombre de minutes depuis minuit."""
+    h, m = heure.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _from_min(minutes: int) -> str:
+    """Convertit un nombre de minutes depuis minuit en heure "HH:MM"."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def group_emploi_temps_by_day(
+    emploi_temps: list[dict],
+) -> dict[str, list[tuple[int, int]]]:
+    """
+    Regroupe l'emploi du temps par jour de la semaine.
+
+    À construire une seule fois par l'appelant puis à passer à find_free_slots
+    pour chaque date, au lieu de refiltrer tout l'emploi du temps chaque jour.
+
+    Args:
+        emploi_temps (list): Les créneaux occupés, dictionnaires avec les clés
+            "jour", "debut" et "fin" ("HH:MM").
+
+    Returns:
+        dict: Jour en minuscules ("lundi", ...) -> liste de tuples
+            (debut, fin) en minutes, triée par heure de début et sans
+            chevauchement.
+    """
+    emploi_temps_by_day = defaultdict(list)
+    for creneau in emploi_temps:
+        emploi_temps_by_day[creneau.get("jour", "").strip().lower()].append(
+            (_to_min(creneau["debut"]), _to_min(creneau["fin"]))
+        )
+    return {
+        jour: _merge_intervals(creneaux)
+        for jour, creneaux in emploi_temps_by_day.items()
+    }
+
+
+def _merge_intervals(creneaux: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    Trie les créneaux et fusionne ceux qui se chevauchent ou se touchent,
+    pour que les écarts calculés entre créneaux consécutifs soient toujours
+    positifs (emplois du temps issus de plusieurs sources).
+    """
+    merged = []
+    for debut, fin in sorted(creneaux):
+        if merged and debut <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], fin))
+        else:
+            merged.append((debut, fin))
+    return merged
+
+
+def find_free_slots(
+    current_date: date, emploi_temps_by_day: dict[str, list[tuple[int, int]]]
+) -> list[Slot]:
     """
     Trouve les créneaux horaires libres en commençant à 7h du matin et en
     se terminant à 23h.
 
+    Les calculs se font sur des minutes entières ; le format "HH:MM" n'est
+    reconstruit qu'à la sérialisation (Slot.to_dict).
+
     Args:
         current_date (date): La date pour laquelle on recherche les créneaux
             horaires libres.
-        emploi_temps (list): La liste des créneaux horaires déjà occupés pour
-            la date donnée.
+        emploi_temps_by_day (dict): Les créneaux déjà occupés, regroupés par
+            jour, triés et fusionnés (voir group_emploi_temps_by_day).
 
     Returns:
-        list: La liste des créneaux horaires libres pour la date donnée.
+        list: La liste des créneaux libres (Slot) pour la date donnée.
     """
-    day_start = datetime.strptime("07:00", "%H:%M").time()
-    day_end = datetime.strptime("23:00", "%H:%M").time()
-
-    jours_fr = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    jour_semaine = jours_fr[current_date.weekday()]
-
-    creneaux_du_jour = [
-        creneau
-        for creneau in emploi_temps
-        if creneau.get("jour", "").lower() == jour_semaine.lower()
-    ]
+    creneaux_du_jour = emploi_temps_by_day.get(
+        _JOURS_FR_LOWER[current_date.weekday()], ()
+    )
 
-    creneaux_du_jour.sort(key=lambda x: x["debut"])
+    # Journée sans cours : toute la plage 7h-23h est libre
+    if not creneaux_du_jour:
+        return [Slot(DAY_START, DAY_END)]
 
     creneaux_libres = []
 
-    premier_creneau = creneaux_du_jour[0] if creneaux_du_jour else None
-    if premier_creneau:
-        debut_premier = datetime.strptime(premier_creneau["debut"], "%H:%M").time()
-        if debut_premier > day_start:
-            creneaux_libres.append(
-                {"debut": day_start.strftime("%H:%M"), "fin": premier_creneau["debut"]}
-            )
-
-    for i in range(len(creneaux_du_jour) - 1):
-        fin_actuel = creneaux_du_jour[i]["fin"]
-        debut_suivant = creneaux_du_jour[i + 1]["debut"]
-
-        fin_actuel_time = datetime.strptime(fin_actuel, "%H:%M").time()
-        debut_suivant_time = datetime.strptime(debut_suivant, "%H:%M").time()
-
-        if (
-            datetime.combine(current_date, debut_suivant_time)
-            - datetime.combine(current_date, fin_actuel_time)
-        ).total_seconds() >= 1800:
-            creneaux_libres.append({"debut": fin_actuel, "fin": debut_suivant})
-
-    if creneaux_du_jour:
-        dernier_creneau = creneaux_du_jour[-1]
-        fin_dernier = datetime.strptime(dernier_creneau["fin"], "%H:%M").time()
-        if fin_dernier < day_end:
-            creneaux_libres.append(
-                {"debut": dernier_creneau["fin"], "fin": day_end.strftime("%H:%M")}
-            )
+    # Seuls les créneaux d'au moins 30 minutes sont retenus
+    debut_premier = creneaux_du_jour[0][0]
+    if debut_premier - DAY_START >= 30:
+        creneaux_libres.append(Slot(DAY_START, debut_premier))
 
-    if not creneaux_du_jour:
-        creneaux_libres = [
-            {"debut": day_start.strftime("%H:%M"), "fin": day_end.strftime("%H:%M")}
-        ]
+    for (_, fin_actuel), (debut_suivant, _) in zip(
+        creneaux_du_jour, creneaux_du_jour[1:]
+    ):
+        if debut_suivant - fin_actuel >= 30:
+            creneaux_libres.append(Slot(fin_actuel, debut_suivant))
 
-    creneaux_libres = [
-        creneau
-        for creneau in creneaux_libres
-        if (
-            datetime.strptime(creneau["fin"], "%H:%M")
-            - datetime.strptime(creneau["debut"], "%H:%M")
-        ).total_seconds()
-        >= 1800
-    ]
+    fin_dernier = creneaux_du_jour[-1][1]
+    if DAY_END - fin_dernier >= 30:
+        creneaux_libres.append(Slot(fin_dernier, DAY_END))
 
     return creneaux_libres
@@ -6,100 +6,181 @@ from flask import (
     url_for,
     flash,
     jsonify,
+    g,
+    session,
 )
 from flask_login import login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager, joinedload, load_only
 from datetime import datetime
-import json
 from datetime import date, timedelta
+from functools import wraps
 
 from app.extensions import db
 from app.models.user import User
 from app.models.enseignant import Enseignant
 from app.models.etudiant import Etudiant
 from app.models.matiere import Matiere
-from app.models.emploi_temps import EmploiTemps
+from app.models.emploi_temps import (
+    EmploiTemps,
+    emploi_temps_cache,
+    emploi_temps_cache_key,
+)
 from app.models.filiere import Filiere
 from app.models.devoir import Devoir
 from app.models.devoir_vu import DevoirVu
 from app.models.notification import Notification
 from app.models.presence import Presence
 from app.models.note import Note
+from app.utils.cache import TwoLevelCache
+from app.utils.json_response import orjson_response
 
 teachers_bp = Blueprint("teachers", __name__, url_prefix="/enseignant")
 
+# Noms des jours tels que stockés dans EmploiTemps.jour, indexés par weekday()
+JOURS_FR = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
 
-@teachers_bp.route("/dashboard")
-@login_required
-def dashboard():
+# Agrégats du tableau de bord enseignant (voir _dashboard_payload)
+DASHBOARD_CACHE_TTL = 180
+dashboard_cache = TwoLevelCache(default_ttl=DASHBOARD_CACHE_TTL, max_size=500)
+
+# Durée d'une séance hors emploi du temps quand l'heure de fin n'est pas saisie
+SEANCE_DUREE_DEFAUT = timedelta(hours=2)
+
+# Taille des lots lors de la lecture des notes (page notes enseignant)
+NOTES_BATCH_SIZE = 500
+
+# Créneaux fixes de la grille d'emploi du temps (cours et pauses)
+HORAIRE_CONFIG = [
+    {"label": "07:00 - 10:00", "type": "cours"},
+    {"label": "10:00 - 10:30", "type": "pause", "nom": "Récréation"},
+    {"label": "10:30 - 12:30", "type": "cours"},
+    {"label": "12:30 - 13:30", "type": "pause", "nom": "Déjeuner"},
+    {"label": "13:30 - 15:30", "type": "cours"},
+    {"label": "15:30 - 16:00", "type": "pause", "nom": "Pause"},
+    {"label": "16:00 - 18:00", "type": "cours"},
+]
+HORAIRES = [h["label"] for h in HORAIRE_CONFIG]
+
+# Nombre de devoirs à corriger : ne change qu'à la publication d'un devoir
+DEVOIRS_A_CORRIGER_TTL = 3600
+devoirs_count_cache = TwoLevelCache(default_ttl=DEVOIRS_A_CORRIGER_TTL, max_size=500)
+
+
+def _format_heure(heure):
+    """Formate une heure (time ou chaîne "HH:MM[:SS]") en "HH:MM"."""
+    if isinstance(heure, str):
+        h, m = map(int, heure.split(":")[:2])
+        return f"{h:02d}:{m:02d}"
+    return f"{heure:%H:%M}"
+
+
+def _heures_seance(creneau, heure_debut=None, heure_fin=None):
+    """Retourne (heure_debut, heure_fin) de la séance dont on note les présences.
+
+    Les heures saisies ("HH:MM") priment sur celles du créneau. Sans créneau
+    (séance de rattrapage), l'heure de début doit être saisie : elle fait partie
+    de la clé unique de Presence et doit rester la même si le formulaire est
+    renvoyé. Retourne None dans ce cas ; lève ValueError si une heure saisie
+    est mal formée.
     """
-    Route pour afficher le tableau de bord de l'enseignant.
+    debut = datetime.strptime(heure_debut, "%H:%M").time() if heure_debut else None
+    fin = datetime.strptime(heure_fin, "%H:%M").time() if heure_fin else None
+
+    if debut is None:
+        if creneau is None:
+            return None
+        debut = creneau.heure_debut
+        fin = fin or creneau.heure_fin
+    if fin is None:
+        fin = (datetime.combine(date.min, debut) + SEANCE_DUREE_DEFAUT).time()
+    return debut, fin
+
+
+def _upsert(model):
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
+    Retourne un INSERT supportant on_conflict_do_update pour le dialecte de la
+    base courante (PostgreSQL en production, SQLite en développement).
+    """
+    if db.engine.dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return postgresql_insert(model)
 
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Profil enseignant non trouvé.", "error")
-        return redirect(url_for("main.index"))
 
-    # Matières enseignées
-    matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
+def current_enseignant():
+    """
+    Retourne le profil Enseignant de l'utilisateur connecté (ou None).
 
-    # Étudiants (tous ceux des filières/années enseignées)
-    filieres = []
-    annees = []
-    if enseignant.filieres_enseignees:
-        try:
-            data = json.loads(enseignant.filieres_enseignees)
-            filieres = data.get("filieres", [])
-            annees = data.get("annees", [])
-        except Exception:
-            pass
+    L'identifiant du profil est conservé en session depuis la connexion :
+    le profil est alors relu par clé primaire (db.session.get), sans requête
+    si l'objet est déjà dans la session SQLAlchemy. Le résultat est mémorisé
+    dans g pour la durée de la requête.
+    """
+    if "_enseignant" not in g:
+        enseignant = None
+        enseignant_id = session.get("enseignant_id")
+        if enseignant_id is not None:
+            enseignant = db.session.get(Enseignant, enseignant_id)
+            # Session d'un autre compte ou profil supprimé : on la recalcule
+            if enseignant is not None and enseignant.user_id != current_user.id:
+                enseignant = None
+        if enseignant is None:
+            enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
+            if enseignant is not None:
+                session["enseignant_id"] = enseignant.id
+        g._enseignant = enseignant
+    return g._enseignant
+
+
+def require_enseignant(f):
+    """
+    Décorateur des pages enseignant : vérifie le rôle et l'existence du profil,
+    puis passe le profil à la vue via l'argument nommé ``enseignant``.
+    """
 
-    etudiants_count = 0
-    if filieres and annees:
-        etudiants_count = Etudiant.query.filter(
-            Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees)
-        ).count()
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user.role != "enseignant":
+            flash("Accès non autorisé.", "error")
+            return redirect(url_for("main.index"))
 
-    # Cours aujourd'hui (emploi du temps)
+        enseignant = current_enseignant()
+        if not enseignant:
+            flash("Profil enseignant non trouvé.", "error")
+            return redirect(url_for("main.index"))
 
-    # Mapper le jour anglais vers le libellé français utilisé dans EmploiTemps
-    day_map = {
-        "Monday": "Lundi",
-        "Tuesday": "Mardi",
-        "Wednesday": "Mercredi",
-        "Thursday": "Jeudi",
-        "Friday": "Vendredi",
-        "Saturday": "Samedi",
-        "Sunday": "Dimanche",
-    }
-    today_en = datetime.now().strftime("%A")
-    today = day_map.get(today_en, today_en)
+        return f(*args, enseignant=enseignant, **kwargs)
 
-    # On récupère tous les emplois du temps du jour pour cet enseignant
-    cours_aujourdhui = (
-        EmploiTemps.query.join(Matiere, EmploiTemps.matiere_id == Matiere.id)
-        .join(Enseignant, Matiere.enseignant_id == Enseignant.id)
-        .join(User, Enseignant.user_id == User.id)
-        .join(Filiere, EmploiTemps.filiere_id == Filiere.id)
-        .filter(EmploiTemps.jour == today, User.nom == enseignant.user.nom)
-        .order_by(EmploiTemps.heure_debut)
-        .all()
-    )
-    cours_aujourdhui_count = len(cours_aujourdhui)
+    return decorated_function
 
-    # Devoirs à corriger (devoirs de l'enseignant avec fichier uploadé par les étudiants)
-    devoirs_a_corriger = (
-        Devoir.query.filter_by(enseignant_id=enseignant.id)
-        .filter(Devoir.fichier is not None)
-        .count()
-    )
+
+@teachers_bp.route("/dashboard")
+@login_required
+@require_enseignant
+def dashboard(enseignant):
+    """
+    Route pour afficher le tableau de bord de l'enseignant.
+    """
+    # Matières enseignées
+    matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
+
+    # Étudiants (tous ceux des filières/années enseignées)
+    filieres, annees = enseignant.filieres_annees
+
+    # Compteurs et cours du jour : mis en cache quelques minutes par enseignant
+    payload = _dashboard_payload(enseignant, filieres, annees)
 
     # Notifications récentes
     notifications = (
-        Notification.query.filter_by(user_id=current_user.id)
+        Notification.query.with_entities(
+            Notification.id,
+            Notification.type,
+            Notification.message,
+            Notification.date_created,
+        )
+        .filter_by(user_id=current_user.id)
         .order_by(Notification.date_created.desc())
         .limit(5)
         .all()
@@ -113,49 +194,119 @@ def dashboard():
         matieres=matieres,
         matiere=matiere_courante,  # Ajout de la matière courante
         enseignant=enseignant,
-        etudiants_count=etudiants_count,
-        cours_aujourdhui_count=cours_aujourdhui_count,
-        devoirs_a_corriger=devoirs_a_corriger,
-        cours_aujourdhui=cours_aujourdhui,
+        etudiants_count=payload["etudiants_count"],
+        cours_aujourdhui_count=payload["cours_aujourdhui_count"],
+        devoirs_a_corriger=payload["devoirs_a_corriger"],
+        cours_aujourdhui=payload["cours_aujourdhui"],
         notifications=notifications,
     )
 
 
+def _dashboard_cache_key(enseignant_id):
+    return f"teacher_dashboard:{enseignant_id}:{date.today().isoformat()}"
+
+
+def _invalidate_dashboard(enseignant_id):
+    """Force le recalcul du tableau de bord de l'enseignant au prochain affichage."""
+    dashboard_cache.delete(_dashboard_cache_key(enseignant_id))
+
+
+def _devoirs_count_key(enseignant_id):
+    return f"teacher:{enseignant_id}:devoirs_to_grade"
+
+
+def count_devoirs_a_corriger(enseignant_id):
+    """
+    Retourne le nombre de devoirs de l'enseignant avec un fichier joint.
+
+    Le compteur est calculé à la première demande (un COUNT couvert par
+    l'index partiel ix_devoir_enseignant_fichier_notnull) puis conservé
+    DEVOIRS_A_CORRIGER_TTL secondes ; il est invalidé à chaque publication.
+    """
+    cache_key = _devoirs_count_key(enseignant_id)
+    count = devoirs_count_cache.get(cache_key)
+    if count is None:
+        count = (
+            db.session.query(func.count(Devoir.id))
+            .filter(Devoir.enseignant_id == enseignant_id, Devoir.fichier.isnot(None))
+            .scalar()
+        )
+        devoirs_count_cache.set(cache_key, count)
+    return count
+
+
+def _dashboard_payload(enseignant, filieres, annees):
+    """
+    Calcule les agrégats du tableau de bord de l'enseignant (nombre d'étudiants,
+    cours du jour, devoirs à corriger).
+
+    Le résultat, sérialisable en JSON, est mis en cache DASHBOARD_CACHE_TTL
+    secondes par enseignant et par jour.
+    """
+    cache_key = _dashboard_cache_key(enseignant.id)
+    payload = dashboard_cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    etudiants_count = 0
+    if filieres and annees:
+        etudiants_count = Etudiant.query.filter(
+            Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees)
+        ).count()
+
+    # Cours aujourd'hui (emploi du temps)
+    today = JOURS_FR[datetime.now().weekday()]
+
+    # On récupère tous les emplois du temps du jour pour les matières de cet
+    # enseignant (filtre sur la clé étrangère, couvert par l'index jour/matière)
+    cours_aujourdhui = (
+        EmploiTemps.query.join(Matiere, EmploiTemps.matiere_id == Matiere.id)
+        .filter(EmploiTemps.jour == today, Matiere.enseignant_id == enseignant.id)
+        .order_by(EmploiTemps.heure_debut)
+        .all()
+    )
+
+    # Devoirs à corriger (devoirs de l'enseignant avec fichier uploadé par les étudiants)
+    devoirs_a_corriger = count_devoirs_a_corriger(enseignant.id)
+
+    payload = {
+        "etudiants_count": etudiants_count,
+        "cours_aujourdhui_count": len(cours_aujourdhui),
+        "devoirs_a_corriger": devoirs_a_corriger,
+        "cours_aujourdhui": [
+            {
+                "id": cours.id,
+                "heure_debut": cours.heure_debut.strftime("%H:%M"),
+                "heure_fin": cours.heure_fin.strftime("%H:%M"),
+                "salle": cours.salle,
+            }
+            for cours in cours_aujourdhui
+        ],
+    }
+    dashboard_cache.set(cache_key, payload)
+    return payload
+
+
 @teachers_bp.route("/cours-aujourdhui")
 @login_required
-def cours_aujourdhui():
+@require_enseignant
+def cours_aujourdhui(enseignant):
     """
     Fonction qui affiche la liste des cours de l'enseignant de l'utilisateur actuel
     qui ont lieu aujourd'hui.
     """
 
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Profil enseignant non trouvé.", "error")
-        return redirect(url_for("main.index"))
-
-    day_map = {
-        "Monday": "Lundi",
-        "Tuesday": "Mardi",
-        "Wednesday": "Mercredi",
-        "Thursday": "Jeudi",
-        "Friday": "Vendredi",
-        "Saturday": "Samedi",
-        "Sunday": "Dimanche",
-    }
-    today_en = datetime.now().strftime("%A")
-    today = day_map.get(today_en, today_en)
+    today = JOURS_FR[datetime.now().weekday()]
 
-    # Même logique que sur le dashboard : tous les cours du jour pour cet enseignant
+    # Même logique que sur le dashboard : tous les cours du jour pour cet enseignant.
+    # Matière et filière déjà jointes sont chargées avec les créneaux (pas de N+1)
     cours_aujourdhui = (
         EmploiTemps.query.join(Matiere, EmploiTemps.matiere_id == Matiere.id)
-        .join(Enseignant, Matiere.enseignant_id == Enseignant.id)
-        .join(User, Enseignant.user_id == User.id)
         .join(Filiere, EmploiTemps.filiere_id == Filiere.id)
-        .filter(EmploiTemps.jour == today, User.nom == enseignant.user.nom)
+        .options(
+            contains_eager(EmploiTemps.matiere), contains_eager(EmploiTemps.filiere)
+        )
+        .filter(EmploiTemps.jour == today, Matiere.enseignant_id == enseignant.id)
         .order_by(EmploiTemps.heure_debut)
         .all()
     )
@@ -166,47 +317,13 @@ def cours_aujourdhui():
 
 @teachers_bp.route("/notes", methods=["GET", "POST"])
 @login_required
-def notes():
+@require_enseignant
+def notes(enseignant):
     """
     Permet à l'enseignant de consulter les notes de ses étudiants.
     """
 
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    try:
-        data = json.loads(enseignant.filieres_enseignees)
-        filieres = data.get("filieres", [])
-        annees = data.get("annees", [])
-    except Exception:
-        filieres = []
-        annees = []
-
-    etudiants = Etudiant.query.filter(
-        Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees)
-    ).all()
-
-    matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
-
-    # Récupérer les notes existantes pour pré-remplir le formulaire
-    notes_existantes = {}
-    dates_evaluations = {}
-    for matiere in matieres:
-        notes_matiere = Note.query.filter_by(matiere_id=matiere.id).all()
-        for note in notes_matiere:
-            key = f"{note.etudiant_id}_{matiere.id}_{note.type_evaluation}"
-            notes_existantes[key] = note.note
-
-            # Récupérer la date d'évaluation pour cette matière et ce type
-            date_key = f"{matiere.id}_{note.type_evaluation}"
-            if date_key not in dates_evaluations:
-                dates_evaluations[date_key] = (
-                    note.date_evaluation.strftime("%Y-%m-%d")
-                    if note.date_evaluation
-                    else ""
-                )
+    filieres, annees = enseignant.filieres_annees
 
     if request.method == "POST":
         etudiant_id = request.form["etudiant_id"]
@@ -233,9 +350,59 @@ def notes():
             )
             db.session.add(note)
         db.session.commit()
+        _invalidate_dashboard(enseignant.id)
         flash("Note enregistrée.", "success")
         return redirect(url_for("teachers.notes"))
 
+    # Seules les colonnes affichées sont chargées (nom/prénom depuis le compte)
+    etudiants = (
+        db.session.query(
+            Etudiant.id,
+            Etudiant.numero_etudiant,
+            Etudiant.filiere,
+            Etudiant.annee,
+            User.nom,
+            User.prenom,
+        )
+        .join(User, Etudiant.user_id == User.id)
+        .filter(Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees))
+        .all()
+    )
+
+    matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
+
+    # Récupérer les notes existantes pour pré-remplir le formulaire
+    notes_existantes = {}
+    dates_evaluations = {}
+    matiere_ids = [matiere.id for matiere in matieres]
+    # Les notes sont lues par lots (colonnes seules, sans objets ORM) et les
+    # dictionnaires sont construits au fil de l'eau
+    notes_matieres = (
+        db.session.query(
+            Note.etudiant_id,
+            Note.matiere_id,
+            Note.type_evaluation,
+            Note.note,
+            Note.date_evaluation,
+        )
+        .filter(Note.matiere_id.in_(matiere_ids))
+        .yield_per(NOTES_BATCH_SIZE)
+        if matiere_ids
+        else ()
+    )
+    for note in notes_matieres:
+        key = f"{note.etudiant_id}_{note.matiere_id}_{note.type_evaluation}"
+        notes_existantes[key] = note.note
+
+        # Récupérer la date d'évaluation pour cette matière et ce type
+        date_key = f"{note.matiere_id}_{note.type_evaluation}"
+        if date_key not in dates_evaluations:
+            dates_evaluations[date_key] = (
+                note.date_evaluation.strftime("%Y-%m-%d")
+                if note.date_evaluation
+                else ""
+            )
+
     return render_template(
         "enseignant/notes.html",
         etudiants=etudiants,
@@ -247,22 +414,12 @@ def notes():
 
 @teachers_bp.route("/devoirs", methods=["GET", "POST"])
 @login_required
-def devoirs():
+@require_enseignant
+def devoirs(enseignant):
     """
     Permet à l'enseignant de consulter et de gérer les devoirs de ses étudiants.
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    try:
-        data = json.loads(enseignant.filieres_enseignees)
-        filieres = data.get("filieres", [])
-        annees = data.get("annees", [])
-    except Exception:
-        filieres = []
-        annees = []
+    filieres, annees = enseignant.filieres_annees
 
     if request.method == "POST":
         titre = request.form["titre"]
@@ -288,17 +445,23 @@ def devoirs():
             fichier=file_url,  # Stocke l'URL Cloudinary directement
         )
         db.session.add(devoir)
+        db.session.flush()
+        # Notifier tous les étudiants concernés (un seul INSERT multi-lignes),
+        # dans la même transaction que le devoir : un seul commit
+        etudiants_user_ids = Etudiant.query.with_entities(Etudiant.user_id).filter_by(
+            filiere=filiere, annee=annee
+        )
+        Notification.creer_notifications(
+            user_ids=(user_id for (user_id,) in etudiants_user_ids),
+            titre=f"Nouveau {type_devoir}",
+            message=f"Sujet : {titre} - {filiere} {annee}",
+            type="info",
+            commit=False,
+        )
         db.session.commit()
-        # Notifier tous les étudiants concernés
-        etudiants = Etudiant.query.filter_by(filiere=filiere, annee=annee).all()
-        for etu in etudiants:
-            Notification.creer_notification(
-                user_id=etu.user_id,
-                titre=f"Nouveau {type_devoir}",
-                message=f"Sujet : {titre} - {filiere} {annee}",
-                type="info",
-            )
-        db.session.commit()
+        if devoir.fichier:
+            devoirs_count_cache.delete(_devoirs_count_key(enseignant.id))
+        _invalidate_dashboard(enseignant.id)
         flash(
             f"{type_devoir.capitalize()} envoyé à tous les étudiants de {filiere} {annee}.",
             "success",
@@ -309,20 +472,12 @@ def devoirs():
 
 @teachers_bp.route("/emploi-temps")
 @login_required
-def emploi_temps():
+@require_enseignant
+def emploi_temps(enseignant):
     """Page d'accès à l'emploi du temps de l'enseignant.
 
     La page est remplie côté client via l'API JSON correspondante.
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Aucun profil enseignant trouvé.", "error")
-        return redirect(url_for("teachers.dashboard"))
-
     return render_template("enseignant/emploi_temps.html")
 
 
@@ -331,54 +486,39 @@ def emploi_temps():
 def api_emploi_temps():
     """Récupère les emplois du temps de l'enseignant courant en JSON."""
     if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
         return jsonify({"error": "Accès non autorisé"}), 403
 
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
+    enseignant = current_enseignant()
     if not enseignant:
-        flash("Profil enseignant introuvable.", "error")
         return jsonify({"error": "Profil enseignant introuvable"}), 404
 
-    filieres = []
-    annees = []
-    try:
-        data = json.loads(enseignant.filieres_enseignees)
-        filieres = data.get("filieres", [])
-        annees = data.get("annees", [])
-    except Exception:
-        pass
-
-    jours = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi"]
-
-    # Définition des créneaux fixes (Cours et Pauses)
-    horaire_config = [
-        {"label": "07:00 - 10:00", "type": "cours"},
-        {"label": "10:00 - 10:30", "type": "pause", "nom": "Récréation"},
-        {"label": "10:30 - 12:30", "type": "cours"},
-        {"label": "12:30 - 13:30", "type": "pause", "nom": "Déjeuner"},
-        {"label": "13:30 - 15:30", "type": "cours"},
-        {"label": "15:30 - 16:00", "type": "pause", "nom": "Pause"},
-        {"label": "16:00 - 18:00", "type": "cours"},
-    ]
+    cache_key = emploi_temps_cache_key(enseignant.id)
+    payload = emploi_temps_cache.get(cache_key)
+    if payload is not None:
+        return orjson_response(payload)
+
+    filieres, annees = enseignant.filieres_annees
+
+    payload = {
+        "jours": list(JOURS_FR[:6]),
+        "horaires": HORAIRES,
+        "horaire_config": HORAIRE_CONFIG,
+        "creneaux": [],
+    }
 
     if not filieres or not annees:
-        return jsonify(
-            {
-                "jours": jours,
-                "horaires": [h["label"] for h in horaire_config],
-                "horaire_config": horaire_config,
-                "creneaux": [],
-            }
-        )
+        return orjson_response(payload)
 
     filiere_ids = [
-        Filiere.query.filter_by(nom=f).first().id
-        for f in filieres
-        if Filiere.query.filter_by(nom=f).first()
+        filiere_id
+        for (filiere_id,) in db.session.query(Filiere.id).filter(
+            Filiere.nom.in_(filieres)
+        )
     ]
 
     emplois = (
         EmploiTemps.query.join(Matiere, EmploiTemps.matiere_id == Matiere.id)
+        .options(contains_eager(EmploiTemps.matiere), joinedload(EmploiTemps.filiere))
         .filter(
             EmploiTemps.filiere_id.in_(filiere_ids),
             Matiere.enseignant_id == enseignant.id,
@@ -386,70 +526,30 @@ def api_emploi_temps():
         .all()
     )
 
-    def format_label(emploi):
-        hd = emploi.heure_debut
-        hf = emploi.heure_fin
-        if isinstance(hd, str):
-            hd_h, hd_m = map(int, hd.split(":")[:2])
-        else:
-            hd_h, hd_m = hd.hour, hd.minute
-        if isinstance(hf, str):
-            hf_h, hf_m = map(int, hf.split(":")[:2])
-        else:
-            hf_h, hf_m = hf.hour, hf.minute
-        return f"{hd_h:02d}:{hd_m:02d} - {hf_h:02d}:{hf_m:02d}"
-
-    creneaux_json = []
-    for e in emplois:
-        if not e.heure_debut or not e.heure_fin:
-            continue
-        label = format_label(e)
-        matiere = Matiere.query.get(e.matiere_id) if e.matiere_id else None
-
-        creneaux_json.append(
-            {
-                "jour": e.jour,
-                "horaire": label,
-                "matiere": matiere.nom if matiere else None,
-                "filiere": e.filiere.nom if e.filiere else "Inconnue",
-                "annee": matiere.annee if matiere else "N/A",
-                "salle": e.salle,
-                "type": "cours",
-            }
-        )
-
-    return jsonify(
+    payload["creneaux"] = [
         {
-            "jours": jours,
-            "horaires": [h["label"] for h in horaire_config],
-            "horaire_config": horaire_config,
-            "creneaux": creneaux_json,
+            "jour": e.jour,
+            "horaire": f"{_format_heure(e.heure_debut)} - {_format_heure(e.heure_fin)}",
+            "matiere": e.matiere.nom if e.matiere else None,
+            "filiere": e.filiere.nom if e.filiere else "Inconnue",
+            "annee": e.matiere.annee if e.matiere else "N/A",
+            "salle": e.salle,
+            "type": "cours",
         }
-    )
+        for e in emplois
+        if e.heure_debut and e.heure_fin
+    ]
+
+    emploi_temps_cache.set(cache_key, payload)
+    return orjson_response(payload)
 
 
 @teachers_bp.route("/presence", methods=["GET", "POST"])
 @login_required
-def presence():
+@require_enseignant
+def presence(enseignant):
     """Page de gestion des présences pour les enseignants."""
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Profil enseignant non trouvé.", "error")
-        return redirect(url_for("main.index"))
-
-    filieres = []
-    annees = []
-    if enseignant.filieres_enseignees:
-        try:
-            data = json.loads(enseignant.filieres_enseignees)
-            filieres = data.get("filieres", [])
-            annees = data.get("annees", [])
-        except Exception:
-            pass
+    filieres, annees = enseignant.filieres_annees
 
     matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
 
@@ -465,31 +565,77 @@ def presence():
         if matiere_obj and matiere_obj.filiere_id:
             filiere_obj = Filiere.query.get(matiere_obj.filiere_id)
             if filiere_obj and filiere_obj.nom in filieres:
-                etudiants = Etudiant.query.filter_by(
-                    filiere=filiere_obj.nom, annee=selected_annee
-                ).all()
+                etudiants = (
+                    db.session.query(Etudiant.id, User.nom, User.prenom)
+                    .join(User, Etudiant.user_id == User.id)
+                    .filter(
+                        Etudiant.filiere == filiere_obj.nom,
+                        Etudiant.annee == selected_annee,
+                    )
+                    .all()
+                )
 
                 if request.method == "POST":
-                    from datetime import datetime as _dt
+                    date_cours = datetime.strptime(selected_date, "%Y-%m-%d").date()
 
-                    date_presence = _dt.strptime(selected_date, "%Y-%m-%d").date()
-                    for etu in etudiants:
-                        present = f"present_{etu.id}" in request.form
-                        presence_rec = Presence.query.filter_by(
-                            etudiant_id=etu.id,
+                    # Le créneau du cours donne les heures (clé unique de Presence),
+                    # sinon séance hors emploi du temps (rattrapage, cours ajouté)
+                    creneau = (
+                        EmploiTemps.query.filter_by(
                             matiere_id=selected_matiere,
-                            date_presence=date_presence,
-                        ).first()
-                        if presence_rec:
-                            presence_rec.present = present
-                        else:
-                            presence_rec = Presence(
-                                etudiant_id=etu.id,
-                                matiere_id=selected_matiere,
-                                date_presence=date_presence,
-                                present=present,
-                            )
-                            db.session.add(presence_rec)
+                            jour=JOURS_FR[date_cours.weekday()],
+                        )
+                        .order_by(EmploiTemps.heure_debut)
+                        .first()
+                    )
+                    try:
+                        heures = _heures_seance(
+                            creneau,
+                            request.form.get("heure_debut"),
+                            request.form.get("heure_fin"),
+                        )
+                    except ValueError:
+                        flash("Heures de séance invalides.", "error")
+                        return redirect(request.url)
+                    if heures is None:
+                        flash(
+                            "Aucun cours de cette matière à cette date : "
+                            "indiquez l'heure de début de la séance.",
+                            "error",
+                        )
+                        return redirect(request.url)
+                    heure_debut, heure_fin = heures
+
+                    if etudiants:
+                        heure_marquee = datetime.utcnow()
+                        values = [
+                            {
+                                "etudiant_id": etu.id,
+                                "enseignant_id": enseignant.id,
+                                "matiere_id": selected_matiere,
+                                "date_cours": date_cours,
+                                "heure_debut": heure_debut,
+                                "heure_fin": heure_fin,
+                                "present": f"present_{etu.id}" in request.form,
+                                "heure_marquee": heure_marquee,
+                            }
+                            for etu in etudiants
+                        ]
+                        # Un seul INSERT ... ON CONFLICT DO UPDATE pour toute la classe
+                        stmt = _upsert(Presence).values(values)
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[
+                                "etudiant_id",
+                                "matiere_id",
+                                "date_cours",
+                                "heure_debut",
+                            ],
+                            set_={
+                                "present": stmt.excluded.present,
+                                "heure_marquee": stmt.excluded.heure_marquee,
+                            },
+                        )
+                        db.session.execute(stmt)
                     db.session.commit()
                     flash("Présences enregistrées avec succès.", "success")
                     return redirect(request.url)
@@ -509,36 +655,23 @@ def presence():
 
 @teachers_bp.route("/devoirs-a-corriger")
 @login_required
-def devoirs_a_corriger():
+@require_enseignant
+def devoirs_a_corriger(enseignant):
     """
     Permet à l'enseignant de consulter les devoirs à corriger.
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Profil enseignant non trouvé.", "error")
-        return redirect(url_for("main.index"))
-    # On récupère tous les devoirs de l'enseignant avec un fichier uploadé
+    # On récupère tous les devoirs de l'enseignant avec un fichier uploadé,
+    # avec l'étudiant associé (si possible) dans la même requête
     devoirs = (
-        Devoir.query.filter_by(enseignant_id=enseignant.id)
-        .filter(Devoir.fichier is not None)
+        db.session.query(Devoir, Etudiant)
+        .outerjoin(Etudiant, Etudiant.user_id == Devoir.enseignant_id)
+        .filter(Devoir.enseignant_id == enseignant.id, Devoir.fichier.isnot(None))
         .all()
     )
-    # Pour chaque devoir, on cherche l'étudiant qui a uploadé (si possible)
-    devoirs_info = []
-    for d in devoirs:
-        # On suppose que le nom du fichier est unique par étudiant
-        etudiant = None
-        if d.fichier:
-            # On tente de retrouver l'étudiant par le nom du fichier si possible
-            etudiant = Etudiant.query.filter(
-                Etudiant.user_id == d.enseignant_id
-            ).first()
-        devoirs_info.append(
-            {"devoir": d, "nom_fichier": d.fichier, "etudiant": etudiant}
-        )
+    devoirs_info = [
+        {"devoir": d, "nom_fichier": d.fichier, "etudiant": etudiant}
+        for d, etudiant in devoirs
+    ]
     return render_template(
         "enseignant/devoirs_a_corriger.html", devoirs_info=devoirs_info
     )
@@ -546,18 +679,13 @@ def devoirs_a_corriger():
 
 @teachers_bp.route("/devoir/vus/<int:devoir_id>")
 @login_required
-def devoir_vus(devoir_id):
+@require_enseignant
+def devoir_vus(devoir_id, enseignant):
     """
     Permet à l'enseignant de consulter les étudiants qui ont consulté un devoir.
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("teachers.devoirs"))
     devoir = Devoir.query.get_or_404(devoir_id)
-    if (
-        devoir.enseignant_id
-        != Enseignant.query.filter_by(user_id=current_user.id).first().id
-    ):
+    if devoir.enseignant_id != enseignant.id:
         flash("Vous ne pouvez voir que vos propres devoirs.", "error")
         return redirect(url_for("teachers.devoirs"))
     vus = DevoirVu.query.filter_by(devoir_id=devoir_id).all()
@@ -566,60 +694,44 @@ def devoir_vus(devoir_id):
 
 @teachers_bp.route("/mes-etudiants")
 @login_required
-def manage_etudiants():
+@require_enseignant
+def manage_etudiants(enseignant):
     """
     Permet à l'enseignant de consulter les étudiants inscrits dans les filières et années qu'il enseigne.
     """
-    if current_user.role != "enseignant":
-        flash("Accès non autorisé.", "error")
-        return redirect(url_for("main.index"))
-
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-    if not enseignant:
-        flash("Profil enseignant non trouvé.", "error")
-        return redirect(url_for("main.index"))
-
     # Récupérer les filières et années enseignées
-    filieres = []
-    annees = []
-    if enseignant.filieres_enseignees:
-        try:
-            data = json.loads(enseignant.filieres_enseignees)
-            filieres = data.get("filieres", [])
-            annees = data.get("annees", [])
-        except Exception:
-            pass
+    filieres, annees = enseignant.filieres_annees
 
     if not filieres or not annees:
         flash("Aucune filière ou année assignée.", "warning")
         return render_template("enseignant/mes_etudiants.html", etudiants_data=[])
 
-    # Récupérer les étudiants des filières/années enseignées
-    etudiants = Etudiant.query.filter(
-        Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees)
-    ).all()
+    # Récupérer les étudiants des filières/années enseignées (avec leur compte)
+    etudiants = (
+        Etudiant.query.options(joinedload(Etudiant.user))
+        .filter(Etudiant.filiere.in_(filieres), Etudiant.annee.in_(annees))
+        .all()
+    )
 
     # Récupérer les matières de l'enseignant
     matieres = Matiere.query.filter_by(enseignant_id=enseignant.id).all()
     matiere_id_defaut = matieres[0].id if matieres else 1
 
     # Préparer les données pour le template
-    etudiants_data = []
-    for etudiant in etudiants:
-        user = User.query.get(etudiant.user_id)
-        if user:
-            etudiants_data.append((user, etudiant))
-
-    # Statut de présence du jour avec la matière par défaut
-    from datetime import date as _date
-
-    today = _date.today()
-    presence_status = {}
-    for user, etudiant in etudiants_data:
-        presence = Presence.query.filter_by(
-            etudiant_id=etudiant.id, matiere_id=matiere_id_defaut, date_cours=today
-        ).first()
-        presence_status[etudiant.id] = bool(presence.present) if presence else False
+    etudiants_data = [
+        (etudiant.user, etudiant) for etudiant in etudiants if etudiant.user
+    ]
+
+    # Statut de présence du jour avec la matière par défaut, en une seule requête
+    presence_status = dict.fromkeys((etudiant.id for etudiant in etudiants), False)
+    if etudiants:
+        presences = db.session.query(Presence.etudiant_id, Presence.present).filter(
+            Presence.etudiant_id.in_(presence_status),
+            Presence.matiere_id == matiere_id_defaut,
+            Presence.date_cours == date.today(),
+        )
+        for etudiant_id, present in presences:
+            presence_status[etudiant_id] = bool(present)
 
     return render_template(
         "enseignant/mes_etudiants.html",
@@ -680,52 +792,54 @@ def verifier_creneau():
     API pour vérifier si l'enseignant est dans un créneau horaire valide
     """
     if current_user.role != "enseignant":
-        flash("Accès non autorisé", "error")
         return jsonify({"valide": False, "message": "Accès non autorisé"}), 403
 
     matiere_id = request.args.get("matiere_id", type=int)
     if not matiere_id:
-        flash("ID de matière manquant", "error")
         return jsonify({"valide": False, "message": "ID de matière manquant"}), 400
 
     # Récupérer l'enseignant connecté
-    enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
+    enseignant = current_enseignant()
     if not enseignant:
-        flash("Profil enseignant non trouvé", "error")
         return (
             jsonify({"valide": False, "message": "Profil enseignant non trouvé"}),
             404,
         )
 
-    # Obtenir le jour actuel en français
-    jours_fr = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    jour_actuel = jours_fr[datetime.now().weekday()]  # 0 = Lundi, 1 = Mardi, etc.
-    heure_actuelle = datetime.now().time()
+    # Un seul horodatage pour le jour, l'heure et la date (cohérents entre eux)
+    now = datetime.now()
+    jour_actuel = JOURS_FR[now.weekday()]  # 0 = Lundi, 1 = Mardi, etc.
+    heure_actuelle = now.time()
+    today = now.date()
 
     # Trouver le créneau de cours actuel pour cet enseignant et cette matière
-    creneau = EmploiTemps.query.filter(
-        EmploiTemps.enseignant_id == enseignant.id,
-        EmploiTemps.matiere_id == matiere_id,
-        EmploiTemps.jour == jour_actuel,
-        EmploiTemps.heure_debut <= heure_actuelle,
-        EmploiTemps.heure_fin >= heure_actuelle,
-    ).first()
+    creneau = (
+        EmploiTemps.query.options(
+            load_only(EmploiTemps.heure_debut, EmploiTemps.heure_fin, EmploiTemps.salle)
+        )
+        .filter(
+            EmploiTemps.enseignant_id == enseignant.id,
+            EmploiTemps.matiere_id == matiere_id,
+            EmploiTemps.jour == jour_actuel,
+            EmploiTemps.heure_debut <= heure_actuelle,
+            EmploiTemps.heure_fin >= heure_actuelle,
+        )
+        .first()
+    )
 
     if not creneau:
-        flash("Aucun cours prévu à cette heure", "error")
         return jsonify({"valide": False, "message": "Aucun cours prévu à cette heure"})
 
     # Vérifier si on est dans la plage horaire autorisée (15 minutes avant/après le cours)
     marge = 15  # minutes
     debut_autorise = (
-        datetime.combine(date.today(), creneau.heure_debut) - timedelta(minutes=marge)
+        datetime.combine(today, creneau.heure_debut) - timedelta(minutes=marge)
     ).time()
     fin_autorisee = (
-        datetime.combine(date.today(), creneau.heure_fin) + timedelta(minutes=marge)
+        datetime.combine(today, creneau.heure_fin) + timedelta(minutes=marge)
     ).time()
 
     if not (debut_autorise <= heure_actuelle <= fin_autorisee):
-        flash("Hors créneau autorisé", "error")
         return jsonify(
             {
                 "valide": False,
@@ -738,7 +852,6 @@ def verifier_creneau():
             }
         )
 
-    flash("Créneau valide", "success")
 
     return jsonify(
         {
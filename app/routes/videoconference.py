@@ -26,15 +26,69 @@ from app.models.enseignant import Enseignant
 from app.models.filiere import Filiere
 from app.models.emploi_temps import EmploiTemps
 from app.extensions import db
-from sqlalchemy import func
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, raiseload
 import logging
 import secrets
-from datetime import datetime
-from app.utils.room_utils import send_room_invitations
+from datetime import datetime, timedelta
+from app.utils.room_utils import send_room_invitations_async
 
 bp = Blueprint("videoconference", __name__, url_prefix="/videoconference")
 
 
+def _add_participant(room_id, role):
+    """
+    Inscrit l'utilisateur courant comme participant de la salle, sans
+    SELECT préalable : INSERT ... ON CONFLICT DO NOTHING sur (room_id, user_id).
+
+    L'INSERT passe par le Core (pas d'événement after_insert) : l'entrée
+    "joined" du journal d'activité est donc ajoutée ici. Le commit reste à la
+    charge de l'appelant.
+
+    Returns:
+        bool: True si le participant vient d'être créé
+    """
+    if db.engine.dialect.name == "sqlite":
+        insert = sqlite_insert
+    else:
+        insert = postgresql_insert
+    stmt = (
+        insert(RoomParticipant)
+        .values(
+            room_id=room_id,
+            user_id=current_user.id,
+            role=role,
+            joined_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["room_id", "user_id"])
+    )
+    inserted = db.session.execute(stmt).rowcount == 1
+    if inserted:
+        db.session.add(
+            RoomActivityLog(
+                room_id=room_id,
+                user_id=current_user.id,
+                action="joined",
+                details=f"Rôle: {role}",
+            )
+        )
+    return inserted
+
+
+def _eager(*options):
+    """
+    Retourne les options de chargement d'une requête, complétées en
+    développement (DEBUG_SQLALCHEMY_RAISELOAD) par raiseload("*") : toute
+    relation non déclarée ici lève alors une erreur au lieu d'émettre un
+    SELECT paresseux (régression N+1).
+    """
+    if current_app.config.get("DEBUG_SQLALCHEMY_RAISELOAD"):
+        return (*options, raiseload("*"))
+    return options
+
+
 @bp.route("/create", methods=["POST"])
 @login_required
 def create_room():
@@ -136,14 +190,26 @@ def join_room(token):
     Raises:
         NotFound: Si la salle de visioconférence avec le token donné n'existe pas.
     """
-    room = Room.query.filter_by(room_token=token).first_or_404()
+    # La matière est chargée avec la salle (contrôle d'accès sans 2e requête)
+    room = (
+        Room.query.options(*_eager(joinedload(Room.course)))
+        .filter_by(room_token=token)
+        .first_or_404()
+    )
 
     # Vérifier si l'utilisateur a accès au cours
     has_access = False
     if current_user.role == "etudiant":
-        # Vérifier si l'étudiant est inscrit au cours
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
-        has_access = etudiant and etudiant.filiere_id == room.course.filiere_id
+        # Vérifier si l'étudiant est inscrit au cours (filière de la matière),
+        # sans charger le profil : la base ne renvoie qu'un booléen
+        has_access = db.session.query(
+            Etudiant.query.join(Filiere, Filiere.nom == Etudiant.filiere)
+            .filter(
+                Etudiant.user_id == current_user.id,
+                Filiere.id == room.course.filiere_id,
+            )
+            .exists()
+        ).scalar()
     elif current_user.role == "enseignant":
         # Les enseignants ont accès s'ils enseignent le cours ou sont admins
         has_access = (
@@ -153,24 +219,20 @@ def join_room(token):
     if not has_access and not current_user.is_admin:
         abort(403, "Accès non autorisé à cette salle")
 
-    # Enregistrer la participation
+    # Enregistrer la participation (sans effet si l'utilisateur y est déjà)
+    # Si c'est l'hôte de la salle, il garde son rôle de host
+    if current_user.id == room.host_id:
+        role = "host"
+    else:
+        role = "teacher" if current_user.role == "enseignant" else "student"
+
+    if _add_participant(room.id, role):
+        db.session.commit()
+
     participant = RoomParticipant.query.filter_by(
         room_id=room.id, user_id=current_user.id
     ).first()
 
-    if not participant:
-        # Si c'est l'hôte de la salle, il garde son rôle de host
-        if current_user.id == room.host_id:
-            role = "host"
-        else:
-            role = "teacher" if current_user.role == "enseignant" else "student"
-
-        participant = RoomParticipant(
-            room_id=room.id, user_id=current_user.id, role=role
-        )
-        db.session.add(participant)
-        db.session.commit()
-
     return render_template(
         "videoconference/room.html",
         room=room,
@@ -277,26 +339,39 @@ def list_participants(token):
         ]
     }
     """
-    room = Room.query.filter_by(room_token=token).first_or_404()
-
-    # Vérifier que l'utilisateur a accès à cette salle
-    if not (room.host_id == current_user.id or current_user.is_admin):
-        abort(403, "Accès non autorisé")
-
-    participants = RoomParticipant.query.filter_by(room_id=room.id).all()
-
-    return jsonify(
-        [
+    # Participants (avec leur compte) et contrôle d'accès en une seule requête :
+    # seul l'hôte, ou un administrateur, obtient des lignes. joinedload plutôt
+    # que selectinload : RoomParticipant.user est un plusieurs-à-un, le JOIN
+    # n'ajoute aucune ligne et évite le second SELECT ... IN de selectinload
+    query = (
+        RoomParticipant.query.join(Room, Room.id == RoomParticipant.room_id)
+        .options(*_eager(joinedload(RoomParticipant.user)))
+        .filter(Room.room_token == token)
+    )
+    if not current_user.is_admin:
+        query = query.filter(Room.host_id == current_user.id)
+    participants = query.all()
+
+    if not participants:
+        # Aucune ligne : salle inexistante, accès refusé ou salle vide
+        room = Room.query.filter_by(room_token=token).first_or_404()
+        if not (room.host_id == current_user.id or current_user.is_admin):
+            abort(403, "Accès non autorisé")
+
+    result = []
+    for p in participants:
+        user = p.user
+        result.append(
             {
-                "id": p.user.id,
-                "name": f"{p.user.prenom} {p.user.nom}",
+                "id": user.id,
+                "name": f"{user.prenom} {user.nom}",
                 "role": p.role,
                 "joined_at": p.joined_at.isoformat(),
                 "left_at": p.left_at.isoformat() if p.left_at else None,
             }
-            for p in participants
-        ]
-    )
+        )
+
+    return jsonify(result)
 
 
 @bp.route("/room", methods=["GET"])
@@ -316,27 +391,33 @@ def room():
             flash("ID de cours manquant", "error")
             return redirect(url_for("enseignants.dashboard"))
 
-        # Vérifier si l'utilisateur est bien un enseignant
-        enseignant = Enseignant.query.filter_by(user_id=current_user.id).first()
-        if not enseignant:
-            flash("Profil enseignant non trouvé", "error")
-            return redirect(url_for("enseignants.dashboard"))
-
-        # Vérifier si le cours appartient bien à l'enseignant
-        course = Matiere.query.filter_by(
-            id=course_id, enseignant_id=enseignant.id
-        ).first()
+        # Vérifier, en une seule requête, que le cours appartient bien au profil
+        # enseignant de l'utilisateur
+        course = (
+            Matiere.query.join(Enseignant, Enseignant.id == Matiere.enseignant_id)
+            .filter(Enseignant.user_id == current_user.id, Matiere.id == course_id)
+            .first()
+        )
         if not course:
             flash("Cours non trouvé ou accès non autorisé", "error")
             return redirect(url_for("enseignants.dashboard"))
 
         # Vérifier si une salle existe déjà pour ce cours aujourd'hui
+        # (participants chargés avec la salle pour retrouver l'hôte en Python)
+        # Intervalle [aujourd'hui 00:00, demain 00:00) plutôt que
+        # func.date(created_at) : l'index (course_id, created_at) reste utilisable
         today = datetime.now().date()
-        room_obj = Room.query.filter(
-            Room.course_id == course_id,
-            func.date(Room.created_at) == today,
-            Room.is_active,
-        ).first()
+        today_start = datetime.combine(today, datetime.min.time())
+        room_obj = (
+            Room.query.options(*_eager(joinedload(Room.participants)))
+            .filter(
+                Room.course_id == course_id,
+                Room.created_at >= today_start,
+                Room.created_at < today_start + timedelta(days=1),
+                Room.is_active.is_(True),
+            )
+            .first()
+        )
 
         # Créer une nouvelle salle si elle n'existe pas
         if not room_obj:
@@ -351,35 +432,17 @@ def room():
             db.session.add(room_obj)
             db.session.commit()
 
-        # Envoyer les invitations aux étudiants inscrits
-        try:
-            result = send_room_invitations(room_obj.id, current_app)
-            if result.get("success"):
-                flash(f"Salle créée avec succès. {result['message']}", "success")
-            else:
-                flash(
-                    f"La salle a été créée mais des erreurs sont survenues lors de l'envoi des invitations: {result.get('message', 'Erreur inconnue')}",
-                    "warning",
-                )
-        except Exception as e:
-            current_app.logger.error(
-                f"Erreur lors de l'envoi des invitations: {str(e)}"
-            )
-            flash("Erreur lors de l'envoi des invitations.", "warning")
+        # Envoyer les invitations aux étudiants inscrits, en tâche de fond :
+        # la page de la salle s'affiche sans attendre l'envoi des emails
+        send_room_invitations_async(room_obj.id, current_app._get_current_object())
+        flash("Salle prête. Les invitations sont en cours d'envoi.", "success")
 
         # Enregistrer la participation de l'enseignant comme hôte
-        participation = RoomParticipant.query.filter_by(
-            room_id=room_obj.id, user_id=current_user.id
-        ).first()
+        participation = next(
+            (p for p in room_obj.participants if p.user_id == current_user.id), None
+        )
 
-        if not participation:
-            participation = RoomParticipant(
-                room_id=room_obj.id,
-                user_id=current_user.id,
-                joined_at=datetime.utcnow(),
-                role="host",
-            )
-            db.session.add(participation)
+        if not participation and _add_participant(room_obj.id, "host"):
             db.session.commit()
 
         return render_template(
@@ -392,58 +455,60 @@ def room():
 
     # Si l'utilisateur est un étudiant avec un token
     elif room_token and current_user.role == "etudiant":
-        room_obj = Room.query.filter_by(room_token=room_token).first()
-
-        if not room_obj:
-            flash("Salle de cours introuvable ou expirée", "error")
-            return redirect(url_for("students.etudiant_dashboard"))
-
-        # Récupérer les informations du cours
-        course = Matiere.query.get(room_obj.course_id)
-        if not course:
-            flash("Cours introuvable", "error")
-            return redirect(url_for("students.etudiant_dashboard"))
-
-        # Récupérer l'étudiant
-        etudiant = Etudiant.query.filter_by(user_id=current_user.id).first()
-        if not etudiant:
-            flash("Profil étudiant introuvable", "error")
-            return redirect(url_for("students.etudiant_dashboard"))
+        # Salle, cours et contrôle d'inscription en une seule requête : la
+        # matière doit figurer dans l'emploi du temps de la filière de l'étudiant
+        row = (
+            db.session.query(Room, Matiere)
+            .join(Matiere, Matiere.id == Room.course_id)
+            .join(EmploiTemps, EmploiTemps.matiere_id == Matiere.id)
+            .join(Filiere, Filiere.id == EmploiTemps.filiere_id)
+            .join(Etudiant, Etudiant.filiere == Filiere.nom)
+            .filter(
+                Room.room_token == room_token, Etudiant.user_id == current_user.id
+            )
+            .first()
+        )
 
-        # Vérifier si la matière est dans l'emploi du temps de la filière de l'étudiant
-        filiere = Filiere.query.filter_by(nom=etudiant.filiere).first()
-        if not filiere:
-            flash("Filière introuvable", "error")
+        if not row:
+            # Requête d'échec uniquement, pour distinguer les deux messages
+            room_exists = db.session.query(
+                Room.query.filter_by(room_token=room_token).exists()
+            ).scalar()
+            if not room_exists:
+                flash("Salle de cours introuvable ou expirée", "error")
+            else:
+                flash("Vous n'êtes pas inscrit à ce cours", "error")
             return redirect(url_for("students.etudiant_dashboard"))
 
-        # Vérifier si le cours est dans l'emploi du temps de cette filière
-        emploi = EmploiTemps.query.filter_by(
-            filiere_id=filiere.id, matiere_id=room_obj.course_id
-        ).first()
-
-        if not emploi:
-            flash("Vous n'êtes pas inscrit à ce cours", "error")
-            return redirect(url_for("students.etudiant_dashboard"))
+        room_obj, course = row
+
+        # Participation et invitation existantes de l'étudiant, en une requête
+        participation, invitation = (
+            db.session.query(RoomParticipant, RoomInvitation)
+            .select_from(Room)
+            .outerjoin(
+                RoomParticipant,
+                and_(
+                    RoomParticipant.room_id == Room.id,
+                    RoomParticipant.user_id == current_user.id,
+                ),
+            )
+            .outerjoin(
+                RoomInvitation,
+                and_(
+                    RoomInvitation.room_id == Room.id,
+                    RoomInvitation.user_id == current_user.id,
+                ),
+            )
+            .filter(Room.id == room_obj.id)
+            .first()
+        )
 
         # Enregistrer la participation de l'étudiant
-        participation = RoomParticipant.query.filter_by(
-            room_id=room_obj.id, user_id=current_user.id
-        ).first()
-
         if not participation:
-            participation = RoomParticipant(
-                room_id=room_obj.id,
-                user_id=current_user.id,
-                joined_at=datetime.utcnow(),
-                role="student",
-            )
-            db.session.add(participation)
+            _add_participant(room_obj.id, "student")
 
         # Marquer l'invitation comme acceptée
-        invitation = RoomInvitation.query.filter_by(
-            room_id=room_obj.id, user_id=current_user.id
-        ).first()
-
         if invitation and invitation.status != "accepted":
             invitation.status = "accepted"
             invitation.accepted_at = datetime.utcnow()
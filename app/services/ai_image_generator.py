@@ -1,13 +1,26 @@
 import os
+import secrets
 import uuid
 import logging
 import requests
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from typing import Dict, Any, Optional
-from queue import Queue
-import time
 import base64
+import json
+
+from app.utils.cache import QueryCache
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -15,6 +28,12 @@ logger = logging.getLogger(__name__)
 # Récupération de la clé d'API (doit être configurée dans l'environnement)
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# Durée de conservation du statut d'une tâche de génération (secondes)
+RESULTS_TTL = 3600
+
+# Taille des blocs base64 décodés lors de l'écriture d'une image (multiple de 4)
+B64_CHUNK_SIZE = 64 * 1024
+
 
 class GeminiImageGenerator:
     """Générateur d'images utilisant l'API Imagen 3 de Google"""
@@ -23,35 +42,77 @@ class GeminiImageGenerator:
         self.api_key = api_key or GEMINI_API_KEY
         self.model = "imagen-4.0-generate-001"
         self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:predict"
-        self.queue = Queue()
-        self.results = {}
-        self.running = False
-        self.worker_thread = None
+        # Statuts des tâches : bornés en nombre et expirés au bout d'une heure
+        self.results = QueryCache(
+            default_ttl=RESULTS_TTL,
+            max_size=int(os.environ.get("GEMINI_RESULT_CACHE", 10000)),
+        )
+        self.max_workers = int(os.environ.get("GEMINI_WORKERS", 8))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Session HTTP partagée : connexions TLS réutilisées (keep-alive) et
+        # nouvelles tentatives sur les erreurs transitoires de l'API
+        self._http = requests.Session()
+        self._http.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=self.max_workers,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=frozenset({"POST"}),
+                ),
+            ),
+        )
 
     def start_worker(self):
-        """Démarre le worker de traitement en arrière-plan"""
-        if self.worker_thread is None or not self.worker_thread.is_alive():
-            self.running = True
-            self.worker_thread = threading.Thread(
-                target=self._process_queue, daemon=True
+        """
+        Démarre le pool de workers en arrière-plan. Les générations sont
+        limitées par l'attente réseau : plusieurs tâches avancent en parallèle.
+        """
+        with self._executor_lock:
+            self._ensure_executor()
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        """Crée le pool si besoin et le retourne (appelé sous _executor_lock)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="gemini-image",
+            )
+            logger.info(
+                f"Workers de génération d'images Gemini démarrés "
+                f"({self.max_workers})"
             )
-            self.worker_thread.start()
-            logger.info("Worker de génération d'images Gemini démarré")
+        return self._executor
 
     def stop_worker(self):
-        """Arrête le worker"""
-        self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=1.0)
+        """Arrête le pool de workers"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        self._http.close()
 
     def add_task(self, prompt: str, filepath: str) -> str:
-        """Ajoute une tâche de génération à la file d'attente"""
+        """Soumet une tâche de génération au pool de workers"""
         task_id = str(uuid.uuid4())
-        self.results[task_id] = {"status": "pending", "progress": 0}
-        self.queue.put((task_id, prompt, filepath))
+        self.results.set(task_id, {"status": "pending", "progress": 0})
 
-        # S'assurer que le worker tourne
-        self.start_worker()
+        # Vérification et soumission sous le même verrou que stop_worker :
+        # le pool ne peut pas être arrêté entre les deux
+        try:
+            with self._executor_lock:
+                self._ensure_executor().submit(
+                    self._run_task, task_id, prompt, filepath
+                )
+        except RuntimeError as e:
+            # Pool refusant de nouvelles tâches (arrêt de l'interpréteur)
+            logger.error(f"Impossible de soumettre la tâche {task_id}: {e}")
+            self.results.set(task_id, {"status": "failed", "error": str(e)})
 
         return task_id
 
@@ -59,41 +120,33 @@ class GeminiImageGenerator:
         """Récupère le statut d'une tâche"""
         return self.results.get(task_id, {"status": "not_found"})
 
-    def _process_queue(self):
-        """Boucle de traitement des tâches"""
-        while self.running:
-            try:
-                # Attente non bloquante pour pouvoir s'arrêter
-                if self.queue.empty():
-                    time.sleep(1)
-                    continue
-
-                task_id, prompt, filepath = self.queue.get()
-                self.results[task_id]["status"] = "processing"
-                logger.info(f"Traitement tâche {task_id}: {prompt[:50]}...")
-
-                success = self._generate_with_gemini(prompt, filepath)
-
-                if success:
-                    self.results[task_id].update(
-                        {
-                            "status": "completed",
-                            "progress": 100,
-                            "url": filepath,
-                            "completed_at": datetime.utcnow().isoformat(),
-                        }
-                    )
-                    logger.info(f"Tâche {task_id} terminée avec succès")
-                else:
-                    self.results[task_id].update(
-                        {"status": "failed", "error": "La génération a échoué"}
-                    )
-                    logger.error(f"Tâche {task_id} a échoué")
-
-                self.queue.task_done()
-            except Exception as e:
-                logger.error(f"Erreur dans le worker d'images: {e}")
-                time.sleep(2)
+    def _run_task(self, task_id: str, prompt: str, filepath: str):
+        """Traite une tâche de génération (exécutée dans un worker)"""
+        # Le dict est stocké par référence : les mises à jour sont visibles
+        # de get_status sans nouvel appel à set
+        result = {"status": "processing", "progress": 0}
+        self.results.set(task_id, result)
+        try:
+            logger.info(f"Traitement tâche {task_id}: {prompt[:50]}...")
+
+            success = self._generate_with_gemini(prompt, filepath)
+
+            if success:
+                result.update(
+                    {
+                        "status": "completed",
+                        "progress": 100,
+                        "url": filepath,
+                        "completed_at": datetime.utcnow().isoformat(),
+                    }
+                )
+                logger.info(f"Tâche {task_id} terminée avec succès")
+            else:
+                result.update({"status": "failed", "error": "La génération a échoué"})
+                logger.error(f"Tâche {task_id} a échoué")
+        except Exception as e:
+            logger.error(f"Erreur dans le worker d'images: {e}")
+            result.update({"status": "failed", "error": str(e)})
 
     def _generate_with_gemini(self, prompt: str, filepath: str) -> bool:
         """Appel effectif à l'API Imagen 3 via Gemini"""
@@ -110,20 +163,30 @@ class GeminiImageGenerator:
         }
 
         try:
-            response = requests.post(
+            # orjson (si installé) pour sérialiser la requête et surtout parser
+            # la réponse, qui contient l'image en base64 (plusieurs Mo)
+            response = self._http.post(
                 f"{self.base_url}?key={self.api_key}",
                 headers=headers,
-                json=payload,
+                data=(
+                    orjson.dumps(payload) if ORJSON_AVAILABLE else json.dumps(payload)
+                ),
                 timeout=60,
             )
 
             if response.status_code == 200:
-                result = response.json()
+                if ORJSON_AVAILABLE:
+                    result = orjson.loads(response.content)
+                else:
+                    result = response.json()
                 predictions = result.get("predictions", [])
                 if predictions and "bytesBase64Encoded" in predictions[0]:
-                    img_data = base64.b64decode(predictions[0]["bytesBase64Encoded"])
+                    # Décodage par blocs (taille multiple de 4) écrits au fil de
+                    # l'eau : l'image décodée n'est jamais entière en mémoire
+                    b64 = predictions[0]["bytesBase64Encoded"]
                     with open(filepath, "wb") as f:
-                        f.write(img_data)
+                        for i in range(0, len(b64), B64_CHUNK_SIZE):
+                            f.write(base64.b64decode(b64[i : i + B64_CHUNK_SIZE]))
                     return True
                 else:
                     logger.error(f"Format de réponse inattendu: {result}")
@@ -159,7 +222,9 @@ def generate_image_async(
         upload_dir = os.path.join(upload_folder, "ai_attachments", str(conversation_id))
         os.makedirs(upload_dir, exist_ok=True)
 
-        filename = f"gemini_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.png"
+        # Les images sont servies sans authentification depuis /static : le nom
+        # doit rester imprévisible (64 bits aléatoires)
+        filename = f"gemini_{secrets.token_hex(8)}.png"
         filepath = os.path.abspath(os.path.join(upload_dir, filename))
 
         generator = get_generator()
@@ -7,6 +7,7 @@ import os
 import json
 import logging
 import re
+from functools import lru_cache
 from datetime import datetime
 from typing import Dict, Optional, Any, List
 from pathlib import Path
@@ -21,18 +22,29 @@ from reportlab.lib.units import inch
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from sqlalchemy import func, select
 from app.services.gemini_integration import GeminiIntegration
 
+from app.extensions import db
 from app.models.user import User
 from app.models.etudiant import Etudiant
 from app.models.note import Note
 from app.models.matiere import Matiere
+from app.models.filiere import Filiere
 from app.models.competence import Competence
 from app.models.experience import Experience
 from app.models.formation import Formation
 from app.models.langue import Langue
 from app.models.projet import Projet
 
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -77,6 +89,63 @@ for folder in [UPLOAD_FOLDER, TEMPLATES_FOLDER, OUTPUT_FOLDER]:
     folder.mkdir(parents=True, exist_ok=True)
 
 
+def _prompt_json(data: Any) -> str:
+    """
+    Sérialise des données pour un prompt (JSON indenté, non-ASCII conservé),
+    avec orjson si disponible. Les types non JSON passent par str().
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    return json.dumps(data, indent=2, ensure_ascii=False, default=str)
+
+
+@lru_cache(maxsize=1)
+def _load_templates_cached(signature: tuple) -> Dict[str, Dict]:
+    """
+    Lit et parse les modèles de CV. Le résultat est mémorisé pour une
+    signature donnée (chemins et dates de modification des fichiers).
+    """
+    templates = {}
+    for path, _mtime in signature:
+        file_path = Path(path)
+        try:
+            with open(file_path, "rb") as f:
+                raw = f.read()
+            # orjson.JSONDecodeError hérite de json.JSONDecodeError
+            template_data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+            template_id = template_data.get("id")
+            if template_id:
+                templates[template_id] = template_data
+                logger.info(f"Template chargé: {template_id}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Erreur JSON dans {file_path.name}: {e}")
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement de {file_path.name}: {e}")
+    return templates
+
+
+def load_cv_templates() -> Dict[str, Dict]:
+    """
+    Retourne les modèles de CV du dossier TEMPLATES_FOLDER.
+
+    Les fichiers ne sont relus que si l'un d'eux a été ajouté, supprimé ou
+    modifié depuis le dernier appel (seul un stat par fichier est fait).
+    """
+    try:
+        signature = tuple(
+            sorted(
+                (str(file_path), file_path.stat().st_mtime_ns)
+                for file_path in TEMPLATES_FOLDER.glob("*.json")
+            )
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du dossier templates: {e}")
+        return {}
+    return _load_templates_cached(signature)
+
+
 class CVGenerator:
     """Classe principale pour la génération et la gestion des CV"""
 
@@ -155,24 +224,7 @@ class CVGenerator:
 
     def _load_templates(self) -> Dict[str, Dict]:
         """Charge les modèles de CV depuis le dossier des templates"""
-        templates = {}
-        try:
-            for file_path in TEMPLATES_FOLDER.glob("*.json"):
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        template_data = json.load(f)
-                        template_id = template_data.get("id")
-                        if template_id:
-                            templates[template_id] = template_data
-                            logger.info(f"Template chargé: {template_id}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Erreur JSON dans {file_path.name}: {e}")
-                except Exception as e:
-                    logger.error(f"Erreur lors du chargement de {file_path.name}: {e}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la lecture du dossier templates: {e}")
-
-        return templates
+        return dict(load_cv_templates())
 
     def get_user_data(self) -> Dict[str, Any]:
         """Récupère toutes les données de l'utilisateur nécessaires à la génération du CV"""
@@ -271,32 +323,39 @@ class CVGenerator:
         score += basic_score
         details["infos_base"] = basic_score
 
+        # Nombre d'éléments de chaque section en une seule requête
+        # (une sous-requête scalaire COUNT par table)
+        exp_count, form_count, comp_count, lang_count, proj_count = db.session.query(
+            *(
+                select(func.count())
+                .select_from(model)
+                .where(model.user_id == self.user_id)
+                .scalar_subquery()
+                for model in (Experience, Formation, Competence, Langue, Projet)
+            )
+        ).one()
+
         # 2. Expériences (20%)
-        exp_count = Experience.query.filter_by(user_id=self.user_id).count()
         exp_score = min(exp_count * 10, 20)
         score += exp_score
         details["experiences"] = exp_score
 
         # 3. Formations (20%)
-        form_count = Formation.query.filter_by(user_id=self.user_id).count()
         form_score = min(form_count * 10, 20)
         score += form_score
         details["formations"] = form_score
 
         # 4. Compétences (15%)
-        comp_count = Competence.query.filter_by(user_id=self.user_id).count()
         comp_score = min(comp_count * 5, 15)
         score += comp_score
         details["competences"] = comp_score
 
         # 5. Langues (5%)
-        lang_count = Langue.query.filter_by(user_id=self.user_id).count()
         lang_score = 5 if lang_count > 0 else 0
         score += lang_score
         details["langues"] = lang_score
 
         # 6. Projets (10%)
-        proj_count = Projet.query.filter_by(user_id=self.user_id).count()
         proj_score = min(proj_count * 5, 10)
         score += proj_score
         details["projets"] = proj_score
@@ -351,31 +410,28 @@ class CVGenerator:
     def _get_competences_techniques(self) -> List[Dict]:
         """Calcule les compétences techniques à partir des notes"""
         try:
-            matieres = (
-                Matiere.query.join(Note)
+            # Moyenne par matière calculée par la base, filière jointe :
+            # une seule requête quel que soit le nombre de matières
+            moyennes = (
+                db.session.query(Matiere.nom, Filiere.nom, func.avg(Note.note))
+                .join(Note, Note.matiere_id == Matiere.id)
+                .outerjoin(Filiere, Matiere.filiere_id == Filiere.id)
                 .filter(Note.etudiant_id == self.etudiant.id)
-                .distinct()
+                .group_by(Matiere.id, Matiere.nom, Filiere.nom)
                 .all()
             )
 
             competences_techniques = []
-            for matiere in matieres:
-                notes = Note.query.filter_by(
-                    etudiant_id=self.etudiant.id, matiere_id=matiere.id
-                ).all()
-
-                if notes:
-                    moyenne = sum(note.note for note in notes) / len(notes)
-                    niveau = self._get_skill_level(moyenne)
-                    categorie = (
-                        matiere.filiere.nom
-                        if hasattr(matiere, "filiere") and matiere.filiere
-                        else "Autre"
-                    )
-
-                    competences_techniques.append(
-                        {"nom": matiere.nom, "niveau": niveau, "categorie": categorie}
-                    )
+            for matiere_nom, filiere_nom, moyenne in moyennes:
+                if moyenne is None:
+                    continue
+                competences_techniques.append(
+                    {
+                        "nom": matiere_nom,
+                        "niveau": self._get_skill_level(float(moyenne)),
+                        "categorie": filiere_nom or "Autre",
+                    }
+                )
 
             return competences_techniques
         except Exception as e:
@@ -586,7 +642,7 @@ class CVGenerator:
 Tu es un expert en rédaction de CV professionnel.
 
 Section: {section}
-Données: {json.dumps(data, indent=2, ensure_ascii=False)}
+Données: {_prompt_json(data)}
 
 Instructions:
 1. Rédaction concise et impactante
@@ -1223,7 +1279,7 @@ DONNÉES À UTILISER (format JSON simplifié) :
 """
 
         # Ajouter les données utilisateur simplifiées
-        prompt += json.dumps(safe_user_data, indent=2, ensure_ascii=False, default=str)
+        prompt += _prompt_json(safe_user_data)
 
         # Instructions finales
         prompt += """
@@ -2353,7 +2409,7 @@ def get_cv_suggestions():
 Analyse ce CV et fournis des suggestions d'amélioration concrètes et actionnables.
 
 Données du CV:
-{json.dumps(user_data, indent=2, ensure_ascii=False, default=str)}
+{_prompt_json(user_data)}
 
 Fournis tes suggestions dans les catégories suivantes:
 1. Contenu: Ce qui manque ou pourrait être amélioré
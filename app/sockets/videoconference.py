@@ -112,8 +112,11 @@ def cleanup_stale_mappings():
 
 def schedule_cleanup():
     """Programme le prochain nettoyage dans 5 minutes."""
-    Timer(300.0, cleanup_stale_mappings).start()  # 300 secondes = 5 minutes
-    Timer(300.0, schedule_cleanup).start()  # Programme le prochain nettoyage
+    # Timers démons : ils ne bloquent pas l'arrêt du processus
+    for callback in (cleanup_stale_mappings, schedule_cleanup):
+        timer = Timer(300.0, callback)  # 300 secondes = 5 minutes
+        timer.daemon = True
+        timer.start()
 
 
 # Démarrer le nettoyage automatique
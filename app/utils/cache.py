@@ -0,0 +1,180 @@
+"""
+Cache pour l'application DEFITECH
+
+Fournit un cache clé/valeur thread-safe avec expiration (TTL) et taille
+maximale (éviction LRU), utilisé pour éviter de répéter des appels coûteux
+(API Gemini, agrégats SQL) dont le résultat change peu.
+
+Si REDIS_URL est défini et que le paquet redis est installé, TwoLevelCache
+partage en plus les entrées entre les workers via Redis.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+class QueryCache:
+    """
+    Cache en mémoire avec durée de vie et taille bornée.
+
+    Args:
+        default_ttl (int): Durée de vie par défaut d'une entrée, en secondes
+        max_size (int): Nombre maximal d'entrées conservées
+    """
+
+    def __init__(self, default_ttl=3600, max_size=500):
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à la clé, ou default si absente/expirée."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Enregistre une valeur pour ttl secondes (default_ttl si None)."""
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Supprime une entrée si elle existe."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Vide entièrement le cache."""
+        with self._lock:
+            self._data.clear()
+
+
+def make_cache_key(prefix, payload):
+    """
+    Construit une clé de cache stable à partir d'une structure JSON-sérialisable.
+
+    Args:
+        prefix (str): Préfixe de la clé (ex: "plan")
+        payload: Données décrivant l'entrée (dict, list, ...)
+
+    Returns:
+        str: Clé de la forme "<prefix>:<hash>"
+    """
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def get_redis_client():
+    """
+    Retourne un client Redis partagé, ou None si Redis n'est pas configuré
+    (REDIS_URL absent ou paquet redis non installé).
+    """
+    global _redis_client
+
+    if not REDIS_AVAILABLE:
+        return None
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return None
+
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(
+                    redis_url, socket_timeout=1, socket_connect_timeout=1
+                )
+    return _redis_client
+
+
+class TwoLevelCache:
+    """
+    Cache à deux niveaux : QueryCache en mémoire (L1) et Redis (L2, optionnel).
+
+    Les valeurs doivent être sérialisables en JSON pour être stockées dans Redis.
+    Une indisponibilité de Redis n'est jamais bloquante : seul le L1 est utilisé.
+
+    Args:
+        default_ttl (int): Durée de vie par défaut d'une entrée, en secondes
+        max_size (int): Nombre maximal d'entrées conservées en mémoire
+    """
+
+    def __init__(self, default_ttl=3600, max_size=500):
+        self.default_ttl = default_ttl
+        self.local = QueryCache(default_ttl=default_ttl, max_size=max_size)
+
+    def get(self, key, default=None):
+        """Cherche la clé en mémoire puis dans Redis."""
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        client = get_redis_client()
+        if client is None:
+            return default
+        try:
+            raw = client.get(key)
+        except Exception as e:
+            logger.warning(f"Lecture Redis impossible ({key}): {e}")
+            return default
+        if raw is None:
+            return default
+
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Enregistre la valeur en mémoire et dans Redis (SETEX)."""
+        ttl = self.default_ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"Écriture Redis impossible ({key}): {e}")
+
+    def delete(self, key):
+        """Supprime la clé des deux niveaux."""
+        self.local.delete(key)
+
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            client.delete(key)
+        except Exception as e:
+            logger.warning(f"Suppression Redis impossible ({key}): {e}")
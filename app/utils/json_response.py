@@ -0,0 +1,37 @@
+"""
+Réponses JSON rapides pour l'application DEFITECH
+
+Sérialise avec orjson lorsqu'il est installé (nettement plus rapide que le
+module json utilisé par jsonify), sinon avec json de la bibliothèque standard.
+"""
+
+import json
+
+from flask import Response
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def orjson_response(data, status=200):
+    """
+    Construit une réponse application/json à partir de données sérialisables.
+
+    Args:
+        data: Données à sérialiser (dict, list, ...). Avec orjson, les dates,
+            heures et datetime sont sérialisées nativement (ISO 8601).
+        status (int): Code HTTP de la réponse
+
+    Returns:
+        flask.Response: Réponse JSON encodée en UTF-8
+    """
+    if ORJSON_AVAILABLE:
+        body = orjson.dumps(data, option=orjson.OPT_NAIVE_UTC)
+    else:
+        body = json.dumps(data, ensure_ascii=False, default=str)
+    return Response(body, status=status, mimetype="application/json")
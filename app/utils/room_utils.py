@@ -2,7 +2,7 @@
 Utils pour la gestion des salles de cours virtuelles
 """
 
-from app.extensions import db
+from app.extensions import db, socketio
 from app.models.videoconference import Room, RoomInvitation
 from app.models.etudiant import Etudiant
 from app.models.enseignant import Enseignant
@@ -181,3 +181,30 @@ def send_room_invitations(room_id, app):
             "sent": sent_count,
             "errors": error_count,
         }
+
+
+def send_room_invitations_async(room_id, app):
+    """
+    Lance send_room_invitations en tâche de fond (greenlet eventlet via
+    Socket.IO) pour ne pas faire attendre l'enseignant pendant l'envoi.
+
+    Args:
+        room_id (int): ID de la salle de cours
+        app: Instance réelle de l'application Flask
+            (current_app._get_current_object())
+    """
+
+    def run():
+        with app.app_context():
+            try:
+                result = send_room_invitations(room_id, app)
+                app.logger.info(
+                    f"Invitations salle {room_id}: {result.get('message')}"
+                )
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(
+                    f"Erreur lors de l'envoi des invitations (salle {room_id}): {e}"
+                )
+
+    socketio.start_background_task(run)
@@ -0,0 +1,118 @@
+import random
+from datetime import date
+
+import pytest
+
+pytest.importorskip("flask")
+
+from app.routes.study_planner import (  # noqa: E402
+    NUMPY_PLAN_THRESHOLD,
+    cache_gemini_response,
+    compute_day_totals,
+    generate_smart_plan,
+    plan_cache_key,
+)
+
+MATIERES = [{"matiere": "Mathématiques", "moyenne": 9.5, "nb_notes": 3}]
+DEVOIRS = [{"titre": "TP 1", "matiere": "Mathématiques", "jours_restants": 2}]
+
+
+def test_plan_cache_key_depends_on_filiere():
+    key_a = plan_cache_key("Génie Logiciel", "1", MATIERES, DEVOIRS, 7)
+    key_b = plan_cache_key("Génie Civil", "1", MATIERES, DEVOIRS, 7)
+
+    assert key_a != key_b
+
+
+def test_plan_cache_key_depends_on_annee():
+    key_a = plan_cache_key("Génie Logiciel", "1", MATIERES, DEVOIRS, 7)
+    key_b = plan_cache_key("Génie Logiciel", "2", MATIERES, DEVOIRS, 7)
+
+    assert key_a != key_b
+
+
+def test_plan_cache_key_shared_for_identical_inputs():
+    key_a = plan_cache_key("Génie Logiciel", "1", MATIERES, DEVOIRS, 7)
+    key_b = plan_cache_key("Génie Logiciel", "1", list(MATIERES), list(DEVOIRS), 7)
+
+    assert key_a == key_b
+
+
+def _python_day_totals(days_sessions):
+    return [sum(s.get("duree", 0) for s in sessions) for sessions in days_sessions]
+
+
+@pytest.mark.parametrize(
+    "layout",
+    [
+        [21, 0],
+        [0, 21],
+        [10, 0, 11],
+        [0, 7, 0, 8, 0, 9, 0],
+        [25],
+    ],
+)
+def test_compute_day_totals_numpy_matches_python(layout):
+    days_sessions = [
+        [{"duree": 5 + (day * 7 + i) % 40} for i in range(count)]
+        for day, count in enumerate(layout)
+    ]
+    assert sum(layout) > NUMPY_PLAN_THRESHOLD
+
+    assert compute_day_totals(days_sessions) == _python_day_totals(days_sessions)
+
+
+def test_compute_day_totals_random_plans():
+    rng = random.Random(1234)
+    for _ in range(200):
+        days_sessions = [
+            [{"duree": rng.randint(0, 120)} for _ in range(rng.choice([0, 0, 3, 8]))]
+            for _ in range(rng.randint(1, 10))
+        ]
+
+        assert compute_day_totals(days_sessions) == _python_day_totals(days_sessions)
+
+
+def test_generate_smart_plan_days_do_not_share_sessions():
+    weak = [
+        {"matiere": "Maths", "moyenne": 8, "niveau_difficulte": "Critique"},
+    ]
+    result = generate_smart_plan(
+        date(2025, 1, 6), date(2025, 1, 8), 2, [], [], weak, ["Algorithmique"]
+    )
+    first_day, second_day = result["plan"][0], result["plan"][1]
+
+    first_day["sessions"][0]["titre"] = "Modifié"
+
+    assert second_day["sessions"][0]["titre"] != "Modifié"
+
+
+def test_cache_gemini_response_returns_copies():
+    calls = []
+
+    @cache_gemini_response
+    def fake_api(prompt, temperature=0.7):
+        calls.append(prompt)
+        return {"success": True, "data": {"items": [1]}}
+
+    first = fake_api("prompt-copie")
+    first["data"]["items"].append(2)
+    second = fake_api("prompt-copie")
+    second["data"]["items"].append(3)
+
+    assert fake_api("prompt-copie")["data"]["items"] == [1]
+    assert calls == ["prompt-copie"]
+
+
+def test_cache_gemini_response_can_be_bypassed():
+    calls = []
+
+    @cache_gemini_response
+    def fake_api(prompt, temperature=0.7):
+        calls.append(prompt)
+        return {"success": True, "data": {}}
+
+    fake_api("prompt-sans-cache", use_cache=False)
+    fake_api("prompt-sans-cache", use_cache=False)
+
+    assert calls == ["prompt-sans-cache", "prompt-sans-cache"]
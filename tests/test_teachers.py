@@ -0,0 +1,35 @@
+from datetime import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+
+from app.routes.teachers import _heures_seance  # noqa: E402
+
+CRENEAU = SimpleNamespace(heure_debut=time(10, 30), heure_fin=time(12, 30))
+
+
+def test_heures_seance_uses_timetable_slot():
+    assert _heures_seance(CRENEAU) == (time(10, 30), time(12, 30))
+
+
+def test_heures_seance_form_hours_override_slot():
+    assert _heures_seance(CRENEAU, "13:30", "15:30") == (time(13, 30), time(15, 30))
+
+
+def test_heures_seance_without_slot_uses_form_hours():
+    assert _heures_seance(None, "08:15", "09:45") == (time(8, 15), time(9, 45))
+
+
+def test_heures_seance_without_slot_defaults_duration():
+    assert _heures_seance(None, "08:15") == (time(8, 15), time(10, 15))
+
+
+def test_heures_seance_without_slot_requires_start_hour():
+    assert _heures_seance(None) is None
+
+
+def test_heures_seance_rejects_malformed_hour():
+    with pytest.raises(ValueError):
+        _heures_seance(None, "8h")